@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import unittest
+from datetime import UTC, datetime, timedelta
+from unittest import mock
+
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.core.usecases import TradingUseCases
+from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.infra.settings import get_settings
+
+
+# Переключение настроек и DatabaseManager на временный каталог данных
+def _reload_storage() -> None:
+    get_settings().reload()
+    db = DatabaseManager()
+    db.invalidate_paths()
+    db.clear_cache()
+
+
+# Проверка TTL курсов для операций с явно переданным моментом now
+class RatesStalenessTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        paths = {
+            "USERS_PATH": "users.json",
+            "PORTFOLIOS_PATH": "portfolios.json",
+            "RATES_PATH": "rates.json",
+            "EXCHANGE_RATES_PATH": "exchange_rates.json",
+        }
+        env = {key: os.path.join(tmp.name, name) for key, name in paths.items()}
+        env["RATES_TTL_SECONDS"] = "3600"
+        patcher = mock.patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(_reload_storage)
+        self.addCleanup(patcher.stop)
+        _reload_storage()
+
+        for key in ("USERS_PATH", "PORTFOLIOS_PATH"):
+            with open(env[key], "w", encoding="utf-8") as f:
+                f.write("[]")
+
+        self.now = datetime.now(UTC)
+        self.future = self.now + timedelta(days=30)
+        snapshot = {
+            "pairs": {"BTC_USD": {"rate": 50000.0, "source": "coingecko"}},
+            "last_refresh": self.now.isoformat(timespec="seconds"),
+        }
+        with open(env["RATES_PATH"], "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+
+        self.uc = TradingUseCases()
+        self.user_id = self.uc.register("alice", "1234")["user"]["user_id"]
+
+    def test_get_rate_with_future_now_after_fresh_check(self) -> None:
+        self.uc.get_rate("BTC", "USD")
+        with self.assertRaises(ApiRequestError):
+            self.uc.get_rate("BTC", "USD", now=self.future)
+
+    def test_buy_with_future_now_is_stale(self) -> None:
+        self.uc.buy(user_id=self.user_id, currency_code="BTC", amount=0.01)
+        with self.assertLogs("valutatrade_hub.actions", "ERROR"):
+            with self.assertRaises(ApiRequestError):
+                self.uc.buy(
+                    user_id=self.user_id,
+                    currency_code="BTC",
+                    amount=0.01,
+                    now=self.future,
+                )
+
+    def test_sell_with_future_now_is_stale(self) -> None:
+        self.uc.buy(user_id=self.user_id, currency_code="BTC", amount=0.01)
+        with self.assertLogs("valutatrade_hub.actions", "ERROR"):
+            with self.assertRaises(ApiRequestError):
+                self.uc.sell(
+                    user_id=self.user_id,
+                    currency_code="BTC",
+                    amount=0.01,
+                    now=self.future,
+                )
+        # Операция с текущим моментом по-прежнему проходит
+        self.uc.sell(user_id=self.user_id, currency_code="BTC", amount=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,11 @@
 from __future__ import annotations
 
 import argparse
-import json
+import functools
 import sys
+from collections.abc import Callable
 from pathlib import Path
-from typing import Any
-
-from prettytable import PrettyTable
+from typing import TYPE_CHECKING, Any
 
 from valutatrade_hub.core.exceptions import (
     ApiRequestError,
@@ -16,32 +15,33 @@ from valutatrade_hub.core.exceptions import (
     NotLoggedInError,
     ValidationError,
 )
-from valutatrade_hub.core.usecases import TradingUseCases
-from valutatrade_hub.infra.settings import SettingsLoader
-from valutatrade_hub.parser_service.api_clients import (
-    CoinGeckoClient,
-    ExchangeRateApiClient,
-)
-from valutatrade_hub.parser_service.config import ParserConfig
-from valutatrade_hub.parser_service.storage import RatesStorage
-from valutatrade_hub.parser_service.updater import RatesUpdater
+from valutatrade_hub.infra.jsonio import dumps_bytes, loads_bytes
+
+if TYPE_CHECKING:
+    from valutatrade_hub.core.usecases import TradingUseCases
 
 
 # Получение пути до файла сессии из настроек проекта
+# (настройки неизменны в рамках процесса, поэтому путь вычисляется один раз)
+@functools.cache
 def _session_path() -> Path:
-    settings = SettingsLoader()
+    from valutatrade_hub.infra.settings import get_settings
+
+    settings = get_settings()
     raw = settings.get("SESSION_PATH", "data/.session.json")
     return Path(str(raw))
 
 
-# Чтение данных сессии из файла (если файла нет или он битый - None)
+# Чтение данных сессии из файла (если файла нет или он битый - None).
+# Файл читается одним вызовом без предварительных exists()/stat()
 def _load_session() -> dict[str, Any] | None:
-    path = _session_path()
-    if not path.exists():
+    try:
+        raw = _session_path().read_bytes()
+    except OSError:
         return None
     try:
-        payload = json.loads(path.read_text(encoding="utf-8"))
-    except (OSError, json.JSONDecodeError):
+        payload = loads_bytes(raw)
+    except ValueError:
         return None
     if not isinstance(payload, dict):
         return None
@@ -52,10 +52,7 @@ def _load_session() -> dict[str, Any] | None:
 def _save_session(data: dict[str, Any]) -> None:
     path = _session_path()
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(
-        json.dumps(data, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+    path.write_bytes(dumps_bytes(data))
 
 
 # Очистка файла сессии (ошибка удаления не должна ломать работу CLI)
@@ -82,181 +79,267 @@ def _print_kv(title: str, data: dict[str, Any]) -> None:
         print(f"- {k}: {v}")
 
 
-# Приведение типичных ошибок приложения к понятным сообщениям в CLI
-def _handle_error(exc: Exception) -> int:
-    if isinstance(exc, NotLoggedInError):
-        print(str(exc))
-        return 1
+# Обработчики ошибок приложения: печать понятного сообщения и код выхода
+def _print_error(exc: Exception) -> int:
+    print(str(exc))
+    return 1
+
+
+def _print_currency_error(exc: Exception) -> int:
+    print(f"{exc}. Проверьте код валюты.")
+    return 1
+
+
+def _print_api_error(exc: Exception) -> int:
+    print(f"{exc}. Попробуйте позже или запустите update-rates.")
+    return 1
 
-    if isinstance(exc, InsufficientFundsError):
-        print(str(exc))
-        return 1
 
-    if isinstance(exc, CurrencyNotFoundError):
-        print(f"{exc}. Проверьте код валюты.")
-        return 1
+# Таблица обработчиков ошибок: класс исключения -> обработчик
+_ERROR_HANDLERS: dict[type[Exception], Callable[[Exception], int]] = {
+    NotLoggedInError: _print_error,
+    InsufficientFundsError: _print_error,
+    CurrencyNotFoundError: _print_currency_error,
+    ApiRequestError: _print_api_error,
+    ValidationError: _print_error,
+    AuthError: _print_error,
+}
 
-    if isinstance(exc, ApiRequestError):
-        print(f"{exc}. Попробуйте позже или запустите update-rates.")
-        return 1
 
-    if isinstance(exc, ValidationError | AuthError):
-        print(str(exc))
-        return 1
+# Приведение типичных ошибок приложения к понятным сообщениям в CLI
+# (поиск обработчика по MRO - от самого конкретного класса к базовым)
+def _handle_error(exc: Exception) -> int:
+    for cls in type(exc).__mro__:
+        handler = _ERROR_HANDLERS.get(cls)
+        if handler is not None:
+            return handler(exc)
 
     print(f"Неожиданная ошибка: {exc.__class__.__name__}: {exc}")
     return 1
 
-# Сборка argparse-парсера и определение всех CLI-команд
-def _build_parser() -> argparse.ArgumentParser:
+
+# Аргументы команд с учетными данными (register/login)
+def _add_credentials_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--username", required=True)
+    p.add_argument("--password", required=True)
+
+
+# Аргументы команд торговли (buy/sell)
+def _add_trade_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--currency", required=True)
+    p.add_argument("--amount", required=True, type=float)
+
+
+def _add_show_portfolio_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--base", default="USD")
+
+
+def _add_get_rate_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--from", dest="from_code", required=True)
+    p.add_argument("--to", dest="to_code", required=True)
+
+
+def _add_update_rates_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument(
+        "--source",
+        choices=["coingecko", "exchangerate"],
+        help="Ограничить обновление одним источником",
+    )
+
+
+# Реестр CLI-команд: имя -> (справка, функция добавления аргументов)
+_COMMANDS: dict[
+    str, tuple[str, Callable[[argparse.ArgumentParser], None] | None]
+] = {
+    "register": ("Регистрация пользователя", _add_credentials_args),
+    "login": ("Вход пользователя", _add_credentials_args),
+    "logout": ("Выход (очистка сессии)", None),
+    "show-portfolio": ("Показать портфель", _add_show_portfolio_args),
+    "buy": ("Покупка валюты", _add_trade_args),
+    "sell": ("Продажа валюты", _add_trade_args),
+    "get-rate": ("Получить курс", _add_get_rate_args),
+    "update-rates": ("Обновить курсы", _add_update_rates_args),
+    "show-rates": ("Показать курсы из кэша", None),
+}
+
+
+# Определение выбранной команды без полного разбора аргументов
+# (у корневого парсера нет опций со значениями, поэтому команда -
+# первый позиционный токен)
+def _peek_command(argv: list[str]) -> str | None:
+    for token in argv:
+        if not token.startswith("-"):
+            return token
+    return None
+
+
+# Сборка argparse-парсера: все команды регистрируются для --help,
+# но аргументы добавляются только для выбранной команды.
+# Готовый парсер кэшируется по имени команды для повторных вызовов main_cli
+# в одном процессе (тесты, встраивание)
+@functools.cache
+def _build_parser(command: str | None = None) -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog="valutatrade",
         description="ValutaTrade Hub CLI",
     )
     sub = parser.add_subparsers(dest="command", required=True)
 
-    p_register = sub.add_parser("register", help="Регистрация пользователя")
-    p_register.add_argument("--username", required=True)
-    p_register.add_argument("--password", required=True)
+    for name, (help_text, add_args) in _COMMANDS.items():
+        p = sub.add_parser(name, help=help_text)
+        if add_args is not None and name == command:
+            add_args(p)
+    return parser
 
-    p_login = sub.add_parser("login", help="Вход пользователя")
-    p_login.add_argument("--username", required=True)
-    p_login.add_argument("--password", required=True)
 
-    sub.add_parser("logout", help="Выход (очистка сессии)")
+# Создание use-case слоя только для команд, которые с ним работают
+# (импорт Core/Infra откладывается до выбора команды)
+def _use_cases() -> TradingUseCases:
+    from valutatrade_hub.core.usecases import TradingUseCases
 
-    p_show = sub.add_parser("show-portfolio", help="Показать портфель")
-    p_show.add_argument("--base", default="USD")
+    return TradingUseCases()
 
-    p_buy = sub.add_parser("buy", help="Покупка валюты")
-    p_buy.add_argument("--currency", required=True)
-    p_buy.add_argument("--amount", required=True, type=float)
 
-    p_sell = sub.add_parser("sell", help="Продажа валюты")
-    p_sell.add_argument("--currency", required=True)
-    p_sell.add_argument("--amount", required=True, type=float)
+def _cmd_register(args: argparse.Namespace) -> None:
+    res = _use_cases().register(args.username, args.password)
+    print("Пользователь зарегистрирован.")
+    print(
+        "Demo-mode: при регистрации создается USD-кошелек "
+        "со стартовым балансом 10000.00 USD."
+    )
+    _print_kv("Данные:", res)
 
-    p_rate = sub.add_parser("get-rate", help="Получить курс")
-    p_rate.add_argument("--from", dest="from_code", required=True)
-    p_rate.add_argument("--to", dest="to_code", required=True)
 
-    p_update = sub.add_parser("update-rates", help="Обновить курсы")
-    p_update.add_argument(
-        "--source",
-        choices=["coingecko", "exchangerate"],
-        help="Ограничить обновление одним источником",
+def _cmd_login(args: argparse.Namespace) -> None:
+    res = _use_cases().login(args.username, args.password)
+    _save_session(res)
+    print(f"Вход выполнен: user_id={res['user_id']}, username={res['username']}")
+
+
+def _cmd_logout(args: argparse.Namespace) -> None:
+    _clear_session()
+    print("Сессия очищена.")
+
+
+def _cmd_show_portfolio(args: argparse.Namespace) -> None:
+    session = _require_login()
+    res = _use_cases().show_portfolio(session["user_id"], base=args.base)
+
+    from prettytable import PrettyTable
+
+    table = PrettyTable(["Currency", "Balance"])
+    table.add_rows([[row["currency"], row["balance_display"]] for row in res["rows"]])
+
+    print(table)
+    print(f"TOTAL ({res['base']}): {res['total']:.2f}")
+
+
+def _cmd_buy(args: argparse.Namespace) -> None:
+    session = _require_login()
+    res = _use_cases().buy(
+        user_id=session["user_id"],
+        currency_code=args.currency,
+        amount=args.amount,
     )
+    print("Покупка выполнена.")
+    print(f"Списано: {res['cost_usd']:.2f} {res['base']} по курсу {res['rate']:.8f}")
 
-    sub.add_parser("show-rates", help="Показать курсы из кэша")
-    return parser
+
+def _cmd_sell(args: argparse.Namespace) -> None:
+    session = _require_login()
+    res = _use_cases().sell(
+        user_id=session["user_id"],
+        currency_code=args.currency,
+        amount=args.amount,
+    )
+    print("Продажа выполнена.")
+    print(
+        f"Начислено: {res['revenue_usd']:.2f} {res['base']} "
+        f"по курсу {res['rate']:.8f}"
+    )
+
+
+def _cmd_get_rate(args: argparse.Namespace) -> None:
+    info = _use_cases().get_rate(args.from_code, args.to_code)
+    print(
+        f"{info.pair}: {info.rate} "
+        f"(updated_at={info.updated_at}, source={info.source})"
+    )
+
+
+def _cmd_update_rates(args: argparse.Namespace) -> None:
+    # Инициализация Parser Service (HTTP-стек нужен только здесь)
+    from valutatrade_hub.parser_service.api_clients import (
+        CoinGeckoClient,
+        ExchangeRateApiClient,
+    )
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.storage import RatesStorage
+    from valutatrade_hub.parser_service.updater import RatesUpdater
+
+    config = ParserConfig.load()
+    storage = RatesStorage()
+    clients = [CoinGeckoClient(config), ExchangeRateApiClient(config)]
+    updater = RatesUpdater(clients, storage)
+    updater.run_update(source=args.source)
+    print("Курсы успешно обновлены.")
+
+
+def _cmd_show_rates(args: argparse.Namespace) -> None:
+    from prettytable import PrettyTable
+
+    from valutatrade_hub.parser_service.storage import RatesStorage
+
+    storage = RatesStorage()
+    snapshot = storage.load_snapshot()
+    pairs = snapshot.get("pairs", {})
+    last_refresh = snapshot.get("last_refresh")
+
+    print(f"last_refresh: {last_refresh}")
+    table = PrettyTable(["Pair", "Rate", "Source", "Updated at"])
+    if isinstance(pairs, dict):
+        # Ключи словаря уникальны, поэтому сортировка кортежей идет по паре
+        table.add_rows(
+            [
+                [
+                    pair,
+                    entry.get("rate"),
+                    entry.get("source"),
+                    entry.get("updated_at"),
+                ]
+                for pair, entry in sorted(pairs.items())
+                if isinstance(entry, dict)
+            ]
+        )
+    print(table)
+
+
+# Таблица обработчиков CLI-команд: имя команды -> функция
+_HANDLERS: dict[str, Callable[[argparse.Namespace], None]] = {
+    "register": _cmd_register,
+    "login": _cmd_login,
+    "logout": _cmd_logout,
+    "show-portfolio": _cmd_show_portfolio,
+    "buy": _cmd_buy,
+    "sell": _cmd_sell,
+    "get-rate": _cmd_get_rate,
+    "update-rates": _cmd_update_rates,
+    "show-rates": _cmd_show_rates,
+}
 
 
 # Точка входа CLI: разбор аргументов и вызов нужного use-case
 def main_cli() -> None:
-    parser = _build_parser()
-    args = parser.parse_args()
-
-    uc = TradingUseCases()
+    argv = sys.argv[1:]
+    parser = _build_parser(_peek_command(argv))
+    args = parser.parse_args(argv)
 
     try:
-        if args.command == "register":
-            res = uc.register(args.username, args.password)
-            print("Пользователь зарегистрирован.")
-            print(
-                "Demo-mode: при регистрации создается USD-кошелек "
-                "со стартовым балансом 10000.00 USD."
-            )
-            _print_kv("Данные:", res)
-
-        elif args.command == "login":
-            res = uc.login(args.username, args.password)
-            _save_session(res)
-            print(
-                f"Вход выполнен: user_id={res['user_id']}, username={res['username']}"
-            )
-
-        elif args.command == "logout":
-            _clear_session()
-            print("Сессия очищена.")
-
-        elif args.command == "show-portfolio":
-            session = _require_login()
-            res = uc.show_portfolio(session["user_id"], base=args.base)
-
-            table = PrettyTable(["Currency", "Balance"])
-            for row in res["rows"]:
-                table.add_row([row["currency"], row["balance_display"]])
-
-            print(table)
-            print(f"TOTAL ({res['base']}): {res['total']:.2f}")
-
-        elif args.command == "buy":
-            session = _require_login()
-            res = uc.buy(
-                user_id=session["user_id"],
-                currency_code=args.currency,
-                amount=args.amount,
-            )
-            print("Покупка выполнена.")
-            print(
-                f"Списано: {res['cost_usd']:.2f} {res['base']} "
-                f"по курсу {res['rate']:.8f}"
-            )
-
-        elif args.command == "sell":
-            session = _require_login()
-            res = uc.sell(
-                user_id=session["user_id"],
-                currency_code=args.currency,
-                amount=args.amount,
-            )
-            print("Продажа выполнена.")
-            print(
-                f"Начислено: {res['revenue_usd']:.2f} {res['base']} "
-                f"по курсу {res['rate']:.8f}"
-            )
-
-        elif args.command == "get-rate":
-            info = uc.get_rate(args.from_code, args.to_code)
-            print(
-                f"{info.pair}: {info.rate} "
-                f"(updated_at={info.updated_at}, source={info.source})"
-            )
-
-        elif args.command == "update-rates":
-            # Инициализация Parser Service
-            config = ParserConfig.load()
-            storage = RatesStorage()
-            clients = [CoinGeckoClient(config), ExchangeRateApiClient(config)]
-            updater = RatesUpdater(clients, storage)
-            updater.run_update(source=args.source)
-            print("Курсы успешно обновлены.")
-
-        elif args.command == "show-rates":
-            storage = RatesStorage()
-            snapshot = storage.load_snapshot()
-            pairs = snapshot.get("pairs", {})
-            last_refresh = snapshot.get("last_refresh")
-
-            print(f"last_refresh: {last_refresh}")
-            table = PrettyTable(["Pair", "Rate", "Source", "Updated at"])
-            if isinstance(pairs, dict):
-                for pair, entry in sorted(pairs.items(), key=lambda x: x[0]):
-                    if not isinstance(entry, dict):
-                        continue
-                    table.add_row(
-                        [
-                            pair,
-                            entry.get("rate"),
-                            entry.get("source"),
-                            entry.get("updated_at"),
-                        ]
-                    )
-            print(table)
-
-        else:
+        handler = _HANDLERS.get(args.command)
+        if handler is None:
             raise ValidationError("Неизвестная команда")
+        handler(args)
 
     except Exception as exc:  # noqa: BLE001
         code = _handle_error(exc)
-        sys.exit(code)
\ No newline at end of file
+        sys.exit(code)
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import functools
+import sys
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 
@@ -101,13 +103,40 @@ _CURRENCY_REGISTRY: dict[str, Currency] = {
 }
 
 
-def get_currency(code: str) -> Currency:
+# Отсортированный по коду список валют (реестр неизменен после импорта модуля)
+_SORTED_CURRENCIES: tuple[Currency, ...] = tuple(
+    sorted(_CURRENCY_REGISTRY.values(), key=lambda c: c.code)
+)
+
+
+# Канонический реестр с интернированными ключами: уже нормализованный код
+# (самый частый случай - "USD", "BTC") находится одной проверкой словаря
+_CANON: dict[str, Currency] = {
+    sys.intern(code): currency for code, currency in _CURRENCY_REGISTRY.items()
+}
+
+
+# Медленный путь с нормализацией кода; набор кодов мал и ограничен, поэтому
+# результат кэшируется (CurrencyNotFoundError/ValidationError не кэшируются)
+@functools.lru_cache(maxsize=64)
+def _lookup_currency(code: str) -> Currency:
     normalized = validate_currency_code(code)
-    currency = _CURRENCY_REGISTRY.get(normalized)
+    currency = _CANON.get(normalized)
     if currency is None:
         raise CurrencyNotFoundError(normalized)
     return currency
 
 
+def get_currency(code: str) -> Currency:
+    if code.__class__ is str:
+        currency = _CANON.get(code)
+        if currency is not None:
+            return currency
+    elif not isinstance(code, str):
+        # Проверка до lru_cache: нехэшируемый код дал бы TypeError
+        validate_currency_code(code)
+    return _lookup_currency(code)
+
+
 def list_currencies() -> list[Currency]:
-    return sorted(_CURRENCY_REGISTRY.values(), key=lambda c: c.code)
+    return list(_SORTED_CURRENCIES)
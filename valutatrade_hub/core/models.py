@@ -1,22 +1,27 @@
 from __future__ import annotations
 
+import bisect
 import hashlib
+import hmac
 import os
+from array import array
+from collections.abc import Mapping
 from dataclasses import dataclass
-from datetime import UTC, datetime
+from datetime import datetime
+from types import MappingProxyType
 from typing import Any
 
 from valutatrade_hub.core.exceptions import InsufficientFundsError, ValidationError
 from valutatrade_hub.core.utils import (
     format_amount,
+    utc_now_iso,
     validate_amount,
     validate_currency_code,
 )
 
-
-# Функция для возврата текущей временной метки в формате ISO 8601 (UTC)
-def _utc_now_iso() -> str:
-    return datetime.now(UTC).replace(microsecond=0).isoformat()
+# Параметры KDF для хэширования паролей
+_PBKDF2_ALGORITHM = "pbkdf2_sha256"
+_PBKDF2_ITERATIONS = 200_000
 
 
 # Функция для вычисления SHA-256 хэша от байтовой последовательности
@@ -24,10 +29,38 @@ def _sha256_bytes(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
 
-# Функция для безопасного хэширования пароля с использованием соли
-def _hash_password(password: str, salt: bytes) -> str:
-    password_bytes = password.encode("utf-8")
-    return _sha256_bytes(password_bytes + salt)
+# Функция для безопасного хэширования пароля с использованием соли (PBKDF2)
+def _hash_password(
+    password: str,
+    salt: bytes,
+    iterations: int = _PBKDF2_ITERATIONS,
+) -> str:
+    digest = hashlib.pbkdf2_hmac(
+        "sha256", password.encode("utf-8"), salt, iterations, dklen=32
+    )
+    return f"{_PBKDF2_ALGORITHM}${iterations}${digest.hex()}"
+
+
+# Проверка пароля по сохраненному хэшу; хэши без префикса алгоритма -
+# старый формат sha256(password + salt), поддерживаемый для совместимости
+def _check_password(password: str, salt: bytes, hashed: str) -> bool:
+    algorithm, sep, rest = hashed.partition("$")
+    if not sep:
+        expected = _sha256_bytes(password.encode("utf-8") + salt)
+        return hmac.compare_digest(expected, hashed)
+
+    # Некорректное число итераций (не ASCII-цифры, 0) - неуспешная проверка,
+    # а не исключение из int()/pbkdf2_hmac
+    iterations_raw, _, _ = rest.partition("$")
+    if algorithm != _PBKDF2_ALGORITHM:
+        return False
+    if not (iterations_raw.isascii() and iterations_raw.isdecimal()):
+        return False
+    iterations = int(iterations_raw)
+    if iterations <= 0:
+        return False
+    expected = _hash_password(password, salt, iterations)
+    return hmac.compare_digest(expected, hashed)
 
 
 # Модель пользователя системы
@@ -57,7 +90,7 @@ class User:
             _username=username.strip(),
             _hashed_password=hashed,
             _salt=salt,
-            _registration_date=_utc_now_iso(),
+            _registration_date=utc_now_iso(),
         )
 
     # Идентификатор пользователя
@@ -79,7 +112,7 @@ class User:
     def verify_password(self, password: str) -> bool:
         if not isinstance(password, str):
             return False
-        return _hash_password(password, self._salt) == self._hashed_password
+        return _check_password(password, self._salt, self._hashed_password)
 
     # Смена пароля после проверки текущего пароля
     def change_password(self, old_password: str, new_password: str) -> None:
@@ -147,16 +180,31 @@ class User:
         )
 
 
-# Модель кошелька пользователя для одной валюты
-@dataclass(slots=True)
+# Модель кошелька пользователя для одной валюты.
+# __init__ написан вручную (без dataclass), чтобы валидация выполнялась
+# один раз при создании, без __post_init__ и повторного вызова сеттера
 class Wallet:
+    __slots__ = ("currency_code", "_balance")
+
     currency_code: str
-    _balance: float = 0.0
+    _balance: float
 
     # Инициализация кошелька с валидацией валюты и начального баланса
-    def __post_init__(self) -> None:
-        self.currency_code = validate_currency_code(self.currency_code)
-        self.balance = self._balance
+    def __init__(self, currency_code: str, _balance: object = 0.0) -> None:
+        self.currency_code = validate_currency_code(currency_code)
+        try:
+            amount = float(_balance)  # type: ignore[arg-type]
+        except (TypeError, ValueError) as exc:
+            raise ValidationError("Баланс должен быть числом") from exc
+        if amount < 0:
+            raise ValidationError("Баланс не может быть отрицательным")
+        self._balance = amount
+
+    def __repr__(self) -> str:
+        return (
+            f"Wallet(currency_code={self.currency_code!r}, "
+            f"_balance={self._balance!r})"
+        )
 
     # Текущий баланс кошелька
     @property
@@ -209,9 +257,7 @@ class Wallet:
             msg = "Некорректная структура кошелька в хранилище"
             raise ValidationError(msg) from exc
 
-        wallet = Wallet(currency_code=code)
-        wallet.balance = bal
-        return wallet
+        return Wallet(currency_code=code, _balance=bal)
 
 
 # Модель портфеля пользователя
@@ -232,18 +278,38 @@ class Portfolio:
     def user(self) -> int:
         return self._user_id
 
-    # Копия словаря кошельков для предотвращения внешней модификации
+    # Представление словаря кошельков только для чтения (без копирования);
+    # кошельки упорядочены по коду валюты, для изменения набора
+    # кошельков используется add_currency()
     @property
-    def wallets(self) -> dict[str, Wallet]:
-        return dict(self._wallets)
-
-    # Добавление валютного кошелька при его отсутствии
+    def wallets(self) -> Mapping[str, Wallet]:
+        return MappingProxyType(self._wallets)
+
+    # Представление кошельков в виде параллельных последовательностей:
+    # коды валют и плотный массив балансов (array('d')) для агрегирующих
+    # расчетов. Строится заново при каждом вызове; изменения - через Wallet
+    def to_soa(self) -> tuple[tuple[str, ...], array[float]]:
+        codes = tuple(self._wallets)
+        balances = array("d", [w.balance for w in self._wallets.values()])
+        return codes, balances
+
+    # Добавление валютного кошелька при его отсутствии.
+    # Кошельки хранятся в порядке кодов валют: новый код, идущий не в конец,
+    # вставляется на свое место перестройкой словаря (кошельков немного)
     def add_currency(self, code: str) -> Wallet:
         normalized = validate_currency_code(code)
         if normalized in self._wallets:
             return self._wallets[normalized]
         wallet = Wallet(currency_code=normalized, _balance=0.0)
-        self._wallets[normalized] = wallet
+        codes = list(self._wallets)
+        pos = bisect.bisect(codes, normalized)
+        if pos == len(codes):
+            self._wallets[normalized] = wallet
+        else:
+            items = list(self._wallets.items())
+            items.insert(pos, (normalized, wallet))
+            self._wallets.clear()
+            self._wallets.update(items)
         return wallet
 
     # Получение кошелька по коду валюты
@@ -280,6 +346,8 @@ class Portfolio:
                 )
             wallets[wallet.currency_code] = wallet
 
+        # Упорядочивание кошельков по коду валюты (см. add_currency)
+        wallets = dict(sorted(wallets.items()))
         return Portfolio(_user_id=user_id, _wallets=wallets)
 
     # Расчет суммарной стоимости портфеля в базовой валюте
@@ -290,7 +358,6 @@ class Portfolio:
         fallback_rates: dict[str, float] | None = None,
     ) -> float:
         base_code = validate_currency_code(base)
-        total = 0.0
 
         pairs: dict[str, Any] = {}
         if isinstance(rates_snapshot, dict):
@@ -298,24 +365,28 @@ class Portfolio:
             if isinstance(pairs_raw, dict):
                 pairs = pairs_raw
 
+        # Курс ищется только для валют, которые есть в портфеле (по ключу
+        # CODE_BASE), поэтому стоимость зависит от числа кошельков, а не от
+        # размера snapshot; fallback_rates - если в snapshot курса нет
+        suffix = "_" + base_code
+        total = 0.0
         for code, wallet in self._wallets.items():
-            if wallet.balance == 0:
+            balance = wallet.balance
+            if balance == 0:
                 continue
 
             if code == base_code:
-                total += wallet.balance
+                total += balance
                 continue
 
-            pair_key = f"{code}_{base_code}"
+            pair_key = code + suffix
             rate: float | None = None
-
             entry = pairs.get(pair_key)
             if isinstance(entry, dict) and "rate" in entry:
                 try:
                     rate = float(entry["rate"])
                 except (TypeError, ValueError):
                     rate = None
-
             if rate is None and fallback_rates is not None:
                 rate = fallback_rates.get(pair_key)
 
@@ -324,7 +395,6 @@ class Portfolio:
                     f"Нет курса для конвертации {code}->{base_code}. "
                     "Запустите update-rates или выберите другую базовую валюту."
                 )
+            total += balance * rate
 
-            total += wallet.balance * rate
-
-        return total
\ No newline at end of file
+        return total
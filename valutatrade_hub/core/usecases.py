@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass
 from datetime import UTC, datetime
 from typing import Any
@@ -8,25 +9,39 @@ from valutatrade_hub.core.currencies import get_currency
 from valutatrade_hub.core.exceptions import ApiRequestError, AuthError, ValidationError
 from valutatrade_hub.core.models import Portfolio, User
 from valutatrade_hub.core.utils import (
+    display_decimals,
     format_amount,
-    make_pair_key,
+    join_pair_key,
+    utc_now_iso,
     validate_amount,
     validate_currency_code,
 )
 from valutatrade_hub.decorators import log_action
 from valutatrade_hub.infra.database import DatabaseManager
-from valutatrade_hub.infra.settings import SettingsLoader
 
+# Граница, до которой баланс форматируется напрямую из float
+_FLOAT_FORMAT_LIMIT = 1e15
 
-# Функция для получения текущего времени в ISO 8601 (UTC)
-def _utc_now_iso() -> str:
-    return datetime.now(UTC).replace(microsecond=0).isoformat()
+
+# Последняя разобранная ISO-строка и результат ее разбора
+_last_parsed: tuple[str, datetime] | None = None
+
+# Окно (в секундах), в течение которого результат проверки TTL переиспользуется
+_STALE_CHECK_WINDOW = 1.0
 
 
 # Функция для парсинга ISO-строки даты/времени и приведения к UTC
 def _parse_iso_datetime(value: object) -> datetime | None:
+    global _last_parsed
+
     if value is None or not isinstance(value, str):
         return None
+
+    # Повторный разбор той же строки (last_refresh при каждом get_rate)
+    # возвращает ранее полученный результат
+    if _last_parsed is not None and _last_parsed[0] == value:
+        return _last_parsed[1]
+
     try:
         v = value.replace("Z", "+00:00")
         dt = datetime.fromisoformat(v)
@@ -35,8 +50,11 @@ def _parse_iso_datetime(value: object) -> datetime | None:
 
     # Приведение времени к timezone-aware формату и единой зоне UTC
     if dt.tzinfo is None:
-        return dt.replace(tzinfo=UTC)
-    return dt.astimezone(UTC)
+        dt = dt.replace(tzinfo=UTC)
+    else:
+        dt = dt.astimezone(UTC)
+    _last_parsed = (value, dt)
+    return dt
 
 
 # Структура для передачи информации о курсе без привязки к формату JSON-хранилища
@@ -52,12 +70,36 @@ class RateInfo:
 class TradingUseCases:
     def __init__(self) -> None:
         self._db = DatabaseManager()
-        self._settings = SettingsLoader()
-
-    # Загрузка пользователей из users.json
+        # Настройки уже загружены DatabaseManager - используется тот же экземпляр
+        self._settings = self._db.settings
+
+        # Разобранные пользователи и индексы по id/username; пересобираются,
+        # только если DatabaseManager вернул другой объект users.json
+        self._users_raw: list[dict[str, Any]] | None = None
+        self._users: list[User] = []
+        self._users_by_id: dict[int, User] = {}
+        self._users_by_name: dict[str, User] = {}
+
+        # Последний результат проверки TTL:
+        # (last_refresh, ttl, now, stale, monotonic)
+        self._stale_memo: tuple[Any, int, datetime | None, bool, float] | None = None
+
+    # Загрузка пользователей из users.json (возвращается новый список,
+    # который вызывающий код может дополнять)
     def _load_users(self) -> list[User]:
         raw = self._db.read_users()
-        return [User.from_dict(item) for item in raw]
+        if raw is not self._users_raw:
+            users = [User.from_dict(item) for item in raw]
+            by_id: dict[int, User] = {}
+            by_name: dict[str, User] = {}
+            for u in users:
+                by_id.setdefault(u.user_id, u)
+                by_name.setdefault(u.username, u)
+            self._users = users
+            self._users_by_id = by_id
+            self._users_by_name = by_name
+            self._users_raw = raw
+        return list(self._users)
 
     # Сохранение пользователей в users.json
     def _save_users(self, users: list[User]) -> None:
@@ -68,30 +110,32 @@ class TradingUseCases:
         raw = self._db.read_portfolios()
         return [Portfolio.from_dict(item) for item in raw]
 
+    # Загрузка портфеля одного пользователя только для чтения
+    # (при отсутствии - пустой портфель, который не сохраняется)
+    def _load_user_portfolio(self, user_id: int) -> Portfolio:
+        raw = self._db.read_portfolio_raw_for_user(user_id)
+        if raw is None:
+            return Portfolio.create_empty(user_id=user_id)
+        return Portfolio.from_dict(raw)
+
     # Сохранение портфелей в portfolios.json
     def _save_portfolios(self, portfolios: list[Portfolio]) -> None:
         self._db.write_portfolios([p.to_dict() for p in portfolios])
 
-    # Поиск пользователя по username в уже загруженном списке
-    def _find_user_by_username(self, username: str, users: list[User]) -> User | None:
-        for u in users:
-            if u.username == username:
-                return u
-        return None
+    # Поиск пользователя по username среди загруженных пользователей
+    def _find_user_by_username(self, username: str) -> User | None:
+        return self._users_by_name.get(username)
 
-    # Поиск пользователя по user_id в уже загруженном списке
-    def _find_user_by_id(self, user_id: int, users: list[User]) -> User | None:
-        for u in users:
-            if u.user_id == user_id:
-                return u
-        return None
+    # Поиск пользователя по user_id среди загруженных пользователей
+    def _find_user_by_id(self, user_id: int) -> User | None:
+        return self._users_by_id.get(user_id)
 
     # Проверка user_id и получение пользователя (единая точка валидации)
     def _require_user(self, user_id: int) -> User:
         if not isinstance(user_id, int) or user_id <= 0:
             raise ValidationError("Некорректный user_id")
-        users = self._load_users()
-        user = self._find_user_by_id(user_id, users)
+        self._load_users()
+        user = self._find_user_by_id(user_id)
         if user is None:
             raise ValidationError("Пользователь не найден")
         return user
@@ -114,19 +158,43 @@ class TradingUseCases:
         return self._db.read_rates_snapshot()
 
     # Проверка актуальности кэша курсов по TTL из настроек
-    def _is_rates_stale(self, snapshot: dict[str, Any]) -> bool:
+    # (now - момент операции, если он уже зафиксирован вызывающим кодом)
+    def _is_rates_stale(
+        self,
+        snapshot: dict[str, Any],
+        now: datetime | None = None,
+    ) -> bool:
         ttl_raw = self._settings.get("RATES_TTL_SECONDS", 3600)
         try:
             ttl = int(ttl_raw)
         except (TypeError, ValueError):
             ttl = 3600
 
-        last_refresh = _parse_iso_datetime(snapshot.get("last_refresh"))
+        # Повторные проверки не пересчитывают возраст кэша: при переданном now
+        # результат определяется (last_refresh, ttl, now) целиком, без него -
+        # переиспользуется в пределах короткого окна
+        raw_refresh = snapshot.get("last_refresh")
+        now_mono = time.monotonic()
+        memo = self._stale_memo
+        if (
+            memo is not None
+            and memo[0] == raw_refresh
+            and memo[1] == ttl
+            and memo[2] == now
+            and (now is not None or now_mono - memo[4] < _STALE_CHECK_WINDOW)
+        ):
+            return memo[3]
+
+        last_refresh = _parse_iso_datetime(raw_refresh)
         if last_refresh is None:
-            return True
+            stale = True
+        else:
+            current = now if now is not None else datetime.now(UTC)
+            age_seconds = (current - last_refresh).total_seconds()
+            stale = age_seconds > ttl
 
-        age_seconds = (datetime.now(UTC) - last_refresh).total_seconds()
-        return age_seconds > ttl
+        self._stale_memo = (raw_refresh, ttl, now, stale, now_mono)
+        return stale
 
     # Регистрация пользователя (создание записи в users.json и пустого портфеля)
     def register(self, username: str, password: str) -> dict[str, Any]:
@@ -138,10 +206,10 @@ class TradingUseCases:
         uname = username.strip()
 
         users = self._load_users()
-        if self._find_user_by_username(uname, users) is not None:
+        if self._find_user_by_username(uname) is not None:
             raise ValidationError("Пользователь с таким именем уже существует")
 
-        next_id = 1 + max((u.user_id for u in users), default=0)
+        next_id = 1 + max(self._users_by_id, default=0)
         user = User.create(user_id=next_id, username=uname, password=password)
 
         portfolios = self._load_portfolios()
@@ -167,15 +235,22 @@ class TradingUseCases:
 
         uname = username.strip()
 
-        users = self._load_users()
-        user = self._find_user_by_username(uname, users)
+        self._load_users()
+        user = self._find_user_by_username(uname)
         if user is None or not user.verify_password(password):
             raise AuthError("Неверное имя пользователя или пароль")
 
         return {"user_id": user.user_id, "username": user.username}
 
     # Получение курса из кэша rates.json с учетом TTL
-    def get_rate(self, from_code: str, to_code: str) -> RateInfo:
+    # (snapshot и момент операции now может передавать вызывающая операция)
+    def get_rate(
+        self,
+        from_code: str,
+        to_code: str,
+        snapshot: dict[str, Any] | None = None,
+        now: datetime | None = None,
+    ) -> RateInfo:
         from_norm = validate_currency_code(from_code)
         to_norm = validate_currency_code(to_code)
 
@@ -183,8 +258,9 @@ class TradingUseCases:
         get_currency(from_norm)
         get_currency(to_norm)
 
-        snapshot = self._get_rates_snapshot()
-        if self._is_rates_stale(snapshot):
+        if snapshot is None:
+            snapshot = self._get_rates_snapshot()
+        if self._is_rates_stale(snapshot, now=now):
             raise ApiRequestError(
                 "Кэш курсов устарел. Запустите команду update-rates для обновления."
             )
@@ -193,8 +269,9 @@ class TradingUseCases:
         if not isinstance(pairs, dict):
             raise ValidationError("Некорректная структура rates.json: pairs")
 
-        direct_pair = make_pair_key(from_norm, to_norm)
-        inverse_pair = make_pair_key(to_norm, from_norm)
+        # Коды уже нормализованы выше, повторная валидация не нужна
+        direct_pair = join_pair_key(from_norm, to_norm)
+        inverse_pair = join_pair_key(to_norm, from_norm)
 
         entry = pairs.get(direct_pair)
         inverse_entry = pairs.get(inverse_pair)
@@ -233,7 +310,7 @@ class TradingUseCases:
 
         # Если метаданные не заполнены, то берется last_refresh
         if not updated_at:
-            updated_at = str(snapshot.get("last_refresh") or _utc_now_iso())
+            updated_at = str(snapshot.get("last_refresh") or utc_now_iso())
         if not source:
             source = "cache"
 
@@ -246,14 +323,15 @@ class TradingUseCases:
         base_code = validate_currency_code(base)
         get_currency(base_code)
 
-        portfolios = self._load_portfolios()
-        portfolio = self._get_or_create_portfolio(user.user_id, portfolios)
+        # Для отображения разбирается только портфель текущего пользователя
+        portfolio = self._load_user_portfolio(user.user_id)
 
         snapshot = self._get_rates_snapshot()
         total = portfolio.get_total_value(base=base_code, rates_snapshot=snapshot)
 
+        # Кошельки портфеля уже упорядочены по коду валюты
         rows: list[dict[str, Any]] = []
-        for code, wallet in sorted(portfolio.wallets.items(), key=lambda x: x[0]):
+        for code, wallet in portfolio.wallets.items():
             rows.append(
                 {
                     "currency": code,
@@ -269,16 +347,29 @@ class TradingUseCases:
             "total": total
         }
 
-    # Снимок балансов кошельков для verbose-логирования в @log_action
+    # Снимок балансов кошельков для verbose-логирования в @log_action.
+    # Балансы форматируются напрямую из float; Decimal используется только
+    # для очень больших значений, где точности float недостаточно
     def _wallets_snapshot(self, portfolio: Portfolio) -> dict[str, str]:
         snap: dict[str, str] = {}
         for code, wallet in portfolio.wallets.items():
-            snap[code] = format_amount(code, wallet.balance)
+            balance = wallet.balance
+            if abs(balance) < _FLOAT_FORMAT_LIMIT:
+                snap[code] = f"{balance:.{display_decimals(code)}f}"
+            else:
+                snap[code] = format_amount(code, balance)
         return snap
 
     # Покупка валюты за USD: списание USD и зачисление купленной валюты
+    # (now - момент начала операции, его передает @log_action)
     @log_action(action="buy", verbose=True)
-    def buy(self, user_id: int, currency_code: str, amount: float) -> dict[str, Any]:
+    def buy(
+        self,
+        user_id: int,
+        currency_code: str,
+        amount: float,
+        now: datetime | None = None,
+    ) -> dict[str, Any]:
         user = self._require_user(user_id)
 
         code = validate_currency_code(currency_code)
@@ -287,13 +378,16 @@ class TradingUseCases:
 
         portfolios = self._load_portfolios()
         portfolio = self._get_or_create_portfolio(user.user_id, portfolios)
+        snapshot = self._get_rates_snapshot()
 
         before = self._wallets_snapshot(portfolio)
 
         usd_wallet = portfolio.add_currency("USD")
         target_wallet = portfolio.add_currency(code)
 
-        rate_info = self.get_rate(from_code=code, to_code="USD")
+        rate_info = self.get_rate(
+            from_code=code, to_code="USD", snapshot=snapshot, now=now
+        )
         cost_usd = amt * rate_info.rate
 
         usd_wallet.withdraw(cost_usd)
@@ -316,8 +410,15 @@ class TradingUseCases:
         }
 
     # Продажа валюты за USD: списание валюты и зачисление выручки в USD
+    # (now - момент начала операции, его передает @log_action)
     @log_action(action="sell", verbose=True)
-    def sell(self, user_id: int, currency_code: str, amount: float) -> dict[str, Any]:
+    def sell(
+        self,
+        user_id: int,
+        currency_code: str,
+        amount: float,
+        now: datetime | None = None,
+    ) -> dict[str, Any]:
         user = self._require_user(user_id)
 
         code = validate_currency_code(currency_code)
@@ -326,6 +427,7 @@ class TradingUseCases:
 
         portfolios = self._load_portfolios()
         portfolio = self._get_or_create_portfolio(user.user_id, portfolios)
+        snapshot = self._get_rates_snapshot()
 
         before = self._wallets_snapshot(portfolio)
 
@@ -334,7 +436,9 @@ class TradingUseCases:
         if target_wallet is None:
             raise ValidationError(f"Кошелек {code} отсутствует в портфеле")
 
-        rate_info = self.get_rate(from_code=code, to_code="USD")
+        rate_info = self.get_rate(
+            from_code=code, to_code="USD", snapshot=snapshot, now=now
+        )
         revenue_usd = amt * rate_info.rate
 
         target_wallet.withdraw(amt)
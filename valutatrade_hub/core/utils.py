@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import functools
 import math
+from datetime import UTC, datetime
 from decimal import Decimal, InvalidOperation
 from typing import Final
 
@@ -9,6 +11,25 @@ from valutatrade_hub.core.exceptions import ValidationError
 _CURRENCY_CODE_MIN_LEN: Final[int] = 2
 _CURRENCY_CODE_MAX_LEN: Final[int] = 5
 
+# Коды валют из реестра core.currencies (уже нормализованные и корректные);
+# для них полная проверка формата не нужна
+_KNOWN_CODES: Final[frozenset[str]] = frozenset(
+    {"USD", "EUR", "GBP", "RUB", "BTC", "ETH", "SOL"}
+)
+
+# Точность отображения сумм: криптовалюты - 4 знака, остальные - 2.
+# Квантователи Decimal строятся один раз при импорте модуля
+_DEFAULT_DECIMALS: Final[int] = 2
+_DECIMALS_BY_CODE: Final[dict[str, int]] = {"BTC": 4, "ETH": 4, "SOL": 4}
+_QUANTIZERS: Final[dict[int, Decimal]] = {2: Decimal("0.01"), 4: Decimal("0.0001")}
+_ZEROS: Final[dict[int, Decimal]] = {
+    decimals: Decimal(0).quantize(q) for decimals, q in _QUANTIZERS.items()
+}
+
+# Текущее время в ISO 8601 (UTC) с точностью до секунд
+def utc_now_iso() -> str:
+    return datetime.now(UTC).isoformat(timespec="seconds")
+
 # Валидация и нормализация кода валюты
 def validate_currency_code(code: str) -> str:
     """
@@ -20,9 +41,24 @@ def validate_currency_code(code: str) -> str:
     - отсутствие пробелов;
     - допустимы только буквенно-цифровые символы.
     """
-    if not isinstance(code, str):
-        raise ValidationError("Код валюты должен быть строкой")
+    if code.__class__ is not str:
+        if not isinstance(code, str):
+            raise ValidationError("Код валюты должен быть строкой")
+        # Подклассы str приводятся к str для единообразного кэширования
+        code = str(code)
+
+    # Быстрый путь для известных кодов: проверка по frozenset -
+    # одна операция хэширования
+    upper = code.upper()
+    if upper in _KNOWN_CODES:
+        return upper
+    return _validate_currency_code_slow(code)
 
+
+# Полная проверка формата кода валюты. Результат кэшируется по исходной
+# строке (ошибки ValidationError lru_cache не кэширует)
+@functools.lru_cache(maxsize=256)
+def _validate_currency_code_slow(code: str) -> str:
     normalized = code.strip().upper()
     if " " in normalized:
         raise ValidationError("Код валюты не должен содержать пробелы")
@@ -34,10 +70,16 @@ def validate_currency_code(code: str) -> str:
 
 # Валидация числового значения суммы операции
 def validate_amount(amount: object) -> float:
-    try:
-        value = float(amount)  # type: ignore[arg-type]
-    except (TypeError, ValueError):
-        raise ValidationError("Сумма должна быть числом") from None
+    # Быстрый путь для уже числовых значений (аргументы CLI, балансы)
+    if type(amount) is float:
+        value = amount
+    elif type(amount) is int:
+        value = float(amount)
+    else:
+        try:
+            value = float(amount)  # type: ignore[arg-type]
+        except (TypeError, ValueError):
+            raise ValidationError("Сумма должна быть числом") from None
 
     if not math.isfinite(value):
         raise ValidationError("Сумма должна быть конечным числом")
@@ -45,15 +87,18 @@ def validate_amount(amount: object) -> float:
         raise ValidationError("Сумма должна быть больше 0")
     return value
 
+# Количество знаков после запятой для уже нормализованного кода валюты
+def display_decimals(code_norm: str) -> int:
+    return _DECIMALS_BY_CODE.get(code_norm, _DEFAULT_DECIMALS)
+
 # Форматирование суммы для пользовательского отображения
 def format_amount(code: str, amount: float) -> str:
     code_norm = validate_currency_code(code)
-    decimals = 4 if code_norm in {"BTC", "ETH", "SOL"} else 2
-    q = Decimal("1." + ("0" * decimals))
+    decimals = _DECIMALS_BY_CODE.get(code_norm, _DEFAULT_DECIMALS)
     try:
-        d = Decimal(str(amount)).quantize(q)
+        d = Decimal(str(amount)).quantize(_QUANTIZERS[decimals])
     except (InvalidOperation, ValueError):
-        d = Decimal("0").quantize(q)
+        d = _ZEROS[decimals]
     return f"{d:.{decimals}f}"
 
 # Формирование ключа валютной пары
@@ -61,16 +106,35 @@ def make_pair_key(from_code: str, to_code: str) -> str:
     """
     Формирует ключ валютной пары в формате FROM_TO.
     """
+    # Кэш используется только для точных str: аргументы lru_cache хэшируются
+    # до проверки, и нестроковый код дал бы TypeError вместо ValidationError
+    if from_code.__class__ is str and to_code.__class__ is str:
+        return _make_pair_key_cached(from_code, to_code)
     f = validate_currency_code(from_code)
     t = validate_currency_code(to_code)
     return f"{f}_{t}"
 
+
+# Кэшированное формирование ключа пары (набор пар мал и часто повторяется)
+@functools.lru_cache(maxsize=256)
+def _make_pair_key_cached(from_code: str, to_code: str) -> str:
+    f = validate_currency_code(from_code)
+    t = validate_currency_code(to_code)
+    return f"{f}_{t}"
+
+# Формирование ключа пары из уже нормализованных кодов (без повторной проверки)
+def join_pair_key(from_norm: str, to_norm: str) -> str:
+    return from_norm + "_" + to_norm
+
 # Возвращение инвертированного ключа валютной пары
 def invert_pair_key(pair_key: str) -> str:
     parts = pair_key.split("_", maxsplit=1)
     if len(parts) != 2:
         raise ValidationError("Некорректный ключ пары валют")
-    return make_pair_key(parts[1], parts[0])
+    return join_pair_key(
+        validate_currency_code(parts[1]),
+        validate_currency_code(parts[0]),
+    )
 
 # Возвращение обратного значения валютного курса
 def invert_rate(rate: float) -> float:
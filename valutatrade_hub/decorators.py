@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import functools
+import inspect
 import logging
 from collections.abc import Callable
 from datetime import UTC, datetime
@@ -11,8 +12,24 @@ T = TypeVar("T")
 logger = logging.getLogger("valutatrade_hub.actions")
 
 
-def _iso_utc_now() -> str:
-    return datetime.now(UTC).replace(microsecond=0).isoformat()
+# Общий префикс сообщений; значения подставляются самим logging (lazy %-формат)
+_LOG_PREFIX = "ts=%s action=%s"
+
+
+# Формирование шаблона сообщения и аргументов только из заполненных полей
+def _log_format(
+    ts: str,
+    action: str,
+    fields: tuple[tuple[str, Any], ...],
+) -> tuple[str, list[Any]]:
+    parts = [_LOG_PREFIX]
+    args: list[Any] = [ts, action]
+    for name, value in fields:
+        if value is None or value == "":
+            continue
+        parts.append(f"{name}=%s")
+        args.append(value)
+    return " ".join(parts), args
 
 
 def log_action(
@@ -21,69 +38,65 @@ def log_action(
 ) -> Callable[[Callable[..., T]], Callable[..., T]]:
 
     def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        # Операции с параметром now получают момент начала операции
+        # от декоратора, чтобы не запрашивать текущее время повторно
+        pass_now = "now" in inspect.signature(func).parameters
+
         @functools.wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> T:
-            # фиксация момента начала операции
-            ts = _iso_utc_now()
+            # Если логгер отбрасывает даже ERROR, сообщение не формируется вовсе
+            if not logger.isEnabledFor(logging.ERROR):
+                return func(*args, **kwargs)
+
+            # фиксация момента начала операции (или использование переданного)
+            now = kwargs.get("now")
+            if not isinstance(now, datetime):
+                now = datetime.now(UTC)
+                if pass_now:
+                    kwargs["now"] = now
+            ts = now.isoformat(timespec="seconds")
 
             # извлечение идентификаторов пользователя и параметров операции
-            user_id = kwargs.get("user_id")
-            username = kwargs.get("username")
-            currency_code: str | None = (
-                kwargs.get("currency_code") 
-                or kwargs.get("currency")
+            fields = (
+                ("user_id", kwargs.get("user_id")),
+                ("username", kwargs.get("username")),
+                (
+                    "currency",
+                    kwargs.get("currency_code") or kwargs.get("currency"),
+                ),
+                ("amount", kwargs.get("amount")),
+                ("rate", kwargs.get("rate")),
+                ("base", kwargs.get("base")),
             )
-            amount = kwargs.get("amount")
-            rate = kwargs.get("rate")
-            base = kwargs.get("base")
 
             # состояние кошельков до выполнения операции (verbose-режим)
             pre_state = kwargs.get("_pre_state") if verbose else None
 
             try:
                 result = func(*args, **kwargs)
+            except Exception as exc:
+                # формирование сообщения об ошибке выполнения операции
+                fmt, log_args = _log_format(ts, action, fields)
+                logger.error(
+                    fmt + " result=ERROR error_type=%s error_message=%s",
+                    *log_args,
+                    type(exc).__name__,
+                    exc,
+                )
+                raise
 
+            if logger.isEnabledFor(logging.INFO):
                 # состояние кошельков после выполнения операции (verbose-режим)
                 post_state = kwargs.get("_post_state") if verbose else None
 
                 # формирование сообщения об успешном выполнении
-                msg_parts = [
-                    f"ts={ts}",
-                    f"action={action}",
-                    f"user_id={user_id}" if user_id is not None else "",
-                    f"username={username}" if username else "",
-                    f"currency={currency_code}" if currency_code else "",
-                    f"amount={amount}" if amount is not None else "",
-                    f"rate={rate}" if rate is not None else "",
-                    f"base={base}" if base else "",
-                    "result=OK",
-                ]
-
+                fmt, log_args = _log_format(ts, action, fields)
+                fmt += " result=OK"
                 if verbose and pre_state is not None and post_state is not None:
-                    msg_parts.append(f"wallets_before={pre_state}")
-                    msg_parts.append(f"wallets_after={post_state}")
-
-                logger.info(" ".join(part for part in msg_parts if part))
-                return result
-
-            except Exception as exc:
-                # формирование сообщения об ошибке выполнения операции
-                msg_parts = [
-                    f"ts={ts}",
-                    f"action={action}",
-                    f"user_id={user_id}" if user_id is not None else "",
-                    f"username={username}" if username else "",
-                    f"currency={currency_code}" if currency_code else "",
-                    f"amount={amount}" if amount is not None else "",
-                    f"rate={rate}" if rate is not None else "",
-                    f"base={base}" if base else "",
-                    "result=ERROR",
-                    f"error_type={type(exc).__name__}",
-                    f"error_message={str(exc)}",
-                ]
-
-                logger.error(" ".join(part for part in msg_parts if part))
-                raise
+                    fmt += " wallets_before=%s wallets_after=%s"
+                    log_args += [pre_state, post_state]
+                logger.info(fmt, *log_args)
+            return result
 
         return wrapper
 
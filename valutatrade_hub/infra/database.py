@@ -1,64 +1,249 @@
 from __future__ import annotations
 
-import json
 import os
+import time
+from collections.abc import Callable
 from pathlib import Path
 from typing import Any
 
 from valutatrade_hub.core.exceptions import ValidationError
-from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.infra.jsonio import dumps_bytes, dumps_line, loads_bytes
+from valutatrade_hub.infra.settings import SettingsLoader, get_settings
+
+
+# Проверка структуры users.json (совместимость с User.from_dict())
+def _validate_users_structure(data: list[Any]) -> None:
+    required_keys = {
+        "user_id",
+        "username",
+        "hashed_password",
+        "salt_hex",
+        "registration_date",
+    }
+    for item in data:
+        if not isinstance(item, dict):
+            raise ValidationError("Некорректная структура users.json")
+        if not required_keys.issubset(item.keys()):
+            raise ValidationError("Некорректные данные пользователя в users.json")
+
+
+# Проверка структуры portfolios.json (совместимость с Portfolio.from_dict())
+def _validate_portfolios_structure(data: list[Any]) -> None:
+    for item in data:
+        if not isinstance(item, dict):
+            raise ValidationError("Некорректная структура portfolios.json")
+
+        if "user_id" not in item or "wallets" not in item:
+            raise ValidationError("Некорректная структура портфеля в portfolios.json")
+        if not isinstance(item["wallets"], list):
+            raise ValidationError(
+                "Некорректная структура портфеля: wallets должен быть списком"
+            )
+
+        for w in item["wallets"]:
+            if not isinstance(w, dict):
+                raise ValidationError(
+                    "Некорректная структура кошелька в portfolios.json"
+                )
+            if "currency_code" not in w:
+                raise ValidationError("Кошелек должен содержать currency_code")
+
+
+# Проверка структуры rates.json
+def _validate_rates_structure(data: dict[str, Any]) -> None:
+    if "pairs" not in data or "last_refresh" not in data:
+        raise ValidationError(
+            "Некорректная структура rates.json: ожидаются pairs и last_refresh"
+        )
+    if not isinstance(data["pairs"], dict):
+        raise ValidationError(
+            "Некорректная структура rates.json: pairs должен быть словарем"
+        )
+
+
+# Проверка структуры exchange_rates.json
+def _validate_history_structure(data: list[Any]) -> None:
+    for item in data:
+        if not isinstance(item, dict):
+            raise ValidationError("Некорректная структура exchange_rates.json")
+        if "id" not in item:
+            raise ValidationError(
+                "Некорректная структура записи history: отсутствует id"
+            )
+
+
+# Разбор истории курсов: JSON Lines (по записи на строку) или прежний
+# формат - JSON-массив (определяется по первому значащему байту "[").
+# Неразбираемые строки пропускаются: так остается читаемой история после
+# оборванной дозаписи (обрывок остается отдельной строкой, см.
+# append_exchange_rates_history)
+def _loads_history(raw: bytes) -> list[Any]:
+    if raw.lstrip()[:1] == b"[":
+        return loads_bytes(raw)
+    items: list[Any] = []
+    for line in raw.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(loads_bytes(line))
+        except ValueError:
+            continue
+    return items
+
+
+# Проверка, что файл истории еще в прежнем формате JSON-массива
+def _is_legacy_history(path: Path) -> bool:
+    try:
+        with path.open("rb") as f:
+            while chunk := f.read(4096):
+                head = chunk.lstrip()
+                if head:
+                    return head[:1] == b"["
+    except FileNotFoundError:
+        return False
+    except OSError as exc:
+        raise ValidationError(f"Ошибка чтения JSON-файла: {path}") from exc
+    return False
 
 
 # Класс для работы с JSON-хранилищем проекта
 class DatabaseManager:
     _instance: DatabaseManager | None = None
+    _cache: dict[Path, tuple[Any, int, float]]
+    _paths: dict[str, Path]
+    _jsonl_paths: set[Path]
 
     # Singleton используется для согласованного доступа к файлам данных
     def __new__(cls) -> DatabaseManager:
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._instance._settings = SettingsLoader()
+            cls._instance._settings = get_settings()
+            # Кэш разобранных файлов: путь -> (данные, mtime_ns, время загрузки)
+            cls._instance._cache = {}
+            # Пути к файлам данных: ключ настройки -> Path (вычисляются один раз)
+            cls._instance._paths = {}
+            # Файлы истории, уже проверенные на формат JSON Lines
+            cls._instance._jsonl_paths = set()
         return cls._instance
 
-    # Универсальный метод чтения JSON-файлов с базовой проверкой структуры
-    def _read_json(self, path: Path, expected_type: type) -> Any:
-        if not path.exists():
-            raise ValidationError(f"Файл данных не найден: {path}")
+    # Настройки, с которыми работает хранилище (общий экземпляр SettingsLoader)
+    @property
+    def settings(self) -> SettingsLoader:
+        return self._settings
+
+    # TTL кэша чтения в секундах или None, если кэш отключен настройкой
+    def _cache_ttl(self) -> float | None:
+        if not self._settings.get("CACHE_ENABLED", True):
+            return None
+        try:
+            return float(self._settings.get("DB_CACHE_TTL_SECONDS", 5))
+        except (TypeError, ValueError):
+            return 5.0
+
+    # Сброс кэша чтения (например, после изменения файлов в обход менеджера)
+    def clear_cache(self) -> None:
+        self._cache.clear()
+        self._jsonl_paths.clear()
+
+    # Универсальный метод чтения JSON-файлов с базовой проверкой структуры.
+    # Результат кэшируется: в пределах TTL возвращается без обращения к диску,
+    # после TTL - если mtime файла не изменился. Проверка структуры (validate)
+    # выполняется только при фактическом разборе файла. Возвращаемые данные
+    # общие для всех вызывающих и не должны изменяться на месте.
+    # fresh=True - файл перечитывается с диска в обход кэша (для вызывающих,
+    # которые сами заметили изменение файла и держат свой кэш поверх этого)
+    def _read_json(
+        self,
+        path: Path,
+        expected_type: type,
+        validate: Callable[[Any], None] | None = None,
+        loads: Callable[[bytes], Any] = loads_bytes,
+        fresh: bool = False,
+    ) -> Any:
+        ttl = self._cache_ttl()
+        cached = self._cache.get(path) if ttl is not None and not fresh else None
+        now = time.monotonic()
+        if cached is not None:
+            data, mtime_ns, loaded_at = cached
+            if now - loaded_at < ttl:
+                return data
 
         try:
-            data = json.loads(path.read_text(encoding="utf-8"))
-        except (OSError, json.JSONDecodeError) as exc:
+            st = path.stat()
+        except FileNotFoundError as exc:
+            self._cache.pop(path, None)
+            raise ValidationError(f"Файл данных не найден: {path}") from exc
+        except OSError as exc:
+            raise ValidationError(f"Ошибка чтения JSON-файла: {path}") from exc
+
+        if cached is not None and st.st_mtime_ns == mtime_ns:
+            self._cache[path] = (data, mtime_ns, now)
+            return data
+
+        # Файл читается целиком в байты и разбирается без декодирования в str
+        try:
+            data = loads(path.read_bytes())
+        except (OSError, ValueError) as exc:
             raise ValidationError(f"Ошибка чтения JSON-файла: {path}") from exc
 
         if not isinstance(data, expected_type):
             raise ValidationError(f"Некорректная структура данных в файле {path}")
+        if validate is not None:
+            validate(data)
+
+        if ttl is not None:
+            self._cache[path] = (data, st.st_mtime_ns, now)
         return data
 
-    # Запись JSON-файла с использованием временного файла для атомарности
+    # Запись JSON-файла с использованием временного файла для атомарности.
+    # Кэш чтения обновляется записанными данными (write-through)
     def _write_json_atomic(self, path: Path, data: Any) -> None:
+        self._write_bytes_atomic(path, dumps_bytes(data), data)
+
+    # Атомарная запись уже сериализованного содержимого файла;
+    # data - соответствующие ему данные для кэша чтения
+    def _write_bytes_atomic(self, path: Path, payload: bytes, data: Any) -> None:
         path.parent.mkdir(parents=True, exist_ok=True)
         tmp_path = path.with_suffix(path.suffix + ".tmp")
 
+        self._cache.pop(path, None)
         try:
-            tmp_path.write_text(
-                json.dumps(data, ensure_ascii=False, indent=2),
-                encoding="utf-8",
-            )
+            tmp_path.write_bytes(payload)
             os.replace(tmp_path, path)
         except OSError as exc:
+            # После успешного os.replace временного файла уже нет,
+            # поэтому удаление нужно только при ошибке записи/замены
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
             raise ValidationError(f"Ошибка записи данных в файл: {path}") from exc
-        finally:
-            if tmp_path.exists():
-                try:
-                    tmp_path.unlink()
-                except OSError:
-                    pass
 
+        if self._cache_ttl() is None:
+            return
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except OSError:
+            return
+        self._cache[path] = (data, mtime_ns, time.monotonic())
+
+    # Путь к файлу данных из настроек; в рамках процесса пути неизменны,
+    # поэтому Path строится при первом обращении и далее берется из кэша
     def _path_from_settings(self, key: str) -> Path:
+        path = self._paths.get(key)
+        if path is not None:
+            return path
+
         raw = self._settings.get(key)
         if not isinstance(raw, str) or not raw.strip():
             raise ValidationError(f"В настройках не задан путь: {key}")
-        return Path(raw)
+        path = Path(raw)
+        self._paths[key] = path
+        return path
+
+    # Сброс кэша путей (например, после подмены настроек)
+    def invalidate_paths(self) -> None:
+        self._paths.clear()
 
     def get_users_path(self) -> Path:
         return self._path_from_settings("USERS_PATH")
@@ -74,22 +259,7 @@ class DatabaseManager:
 
     # Чтение списка пользователей с минимальной структурной проверкой
     def read_users(self) -> list[dict[str, Any]]:
-        data = self._read_json(self.get_users_path(), list)
-        for item in data:
-            if not isinstance(item, dict):
-                raise ValidationError("Некорректная структура users.json")
-
-            # Проверка совместимости с User.from_dict()
-            required_keys = {
-                "user_id",
-                "username",
-                "hashed_password",
-                "salt_hex",
-                "registration_date",
-            }
-            if not required_keys.issubset(item.keys()):
-                raise ValidationError("Некорректные данные пользователя в users.json")
-        return data
+        return self._read_json(self.get_users_path(), list, _validate_users_structure)
 
     # Запись пользователей в users.json
     def write_users(self, users: list[dict[str, Any]]) -> None:
@@ -99,29 +269,20 @@ class DatabaseManager:
 
     # Чтение портфелей пользователей с минимальной структурной проверкой
     def read_portfolios(self) -> list[dict[str, Any]]:
-        data = self._read_json(self.get_portfolios_path(), list)
-        for item in data:
-            if not isinstance(item, dict):
-                raise ValidationError("Некорректная структура portfolios.json")
-
-            # Проверка совместимости с Portfolio.from_dict()
-            if "user_id" not in item or "wallets" not in item:
-                raise ValidationError(
-                    "Некорректная структура портфеля в portfolios.json"
-                )
-            if not isinstance(item["wallets"], list):
-                raise ValidationError(
-                    "Некорректная структура портфеля: wallets должен быть списком"
-                )
+        return self._read_json(
+            self.get_portfolios_path(), list, _validate_portfolios_structure
+        )
 
-            for w in item["wallets"]:
-                if not isinstance(w, dict):
-                    raise ValidationError(
-                        "Некорректная структура кошелька в portfolios.json"
-                    )
-                if "currency_code" not in w:
-                    raise ValidationError("Кошелек должен содержать currency_code")
-        return data
+    # Поиск портфеля одного пользователя среди сырых данных portfolios.json
+    # (без разбора портфелей остальных пользователей); None - если не найден
+    def read_portfolio_raw_for_user(self, user_id: int) -> dict[str, Any] | None:
+        for item in self.read_portfolios():
+            try:
+                if int(item["user_id"]) == user_id:
+                    return item
+            except (TypeError, ValueError):
+                continue
+        return None
 
     # Запись портфелей в portfolios.json
     def write_portfolios(self, portfolios: list[dict[str, Any]]) -> None:
@@ -134,16 +295,7 @@ class DatabaseManager:
 
     # Чтение снимка курсов валют
     def read_rates_snapshot(self) -> dict[str, Any]:
-        data = self._read_json(self.get_rates_path(), dict)
-        if "pairs" not in data or "last_refresh" not in data:
-            raise ValidationError(
-                "Некорректная структура rates.json: ожидаются pairs и last_refresh"
-            )
-        if not isinstance(data["pairs"], dict):
-            raise ValidationError(
-                "Некорректная структура rates.json: pairs должен быть словарем"
-            )
-        return data
+        return self._read_json(self.get_rates_path(), dict, _validate_rates_structure)
 
     # Запись снимка курсов валют
     def write_rates_snapshot(self, snapshot: dict[str, Any]) -> None:
@@ -157,23 +309,58 @@ class DatabaseManager:
             )
         self._write_json_atomic(self.get_rates_path(), snapshot)
 
-    # Чтение истории обновлений курсов
-    def read_exchange_rates_history(self) -> list[dict[str, Any]]:
-        data = self._read_json(self.get_exchange_rates_path(), list)
-        for item in data:
-            if not isinstance(item, dict):
-                raise ValidationError("Некорректная структура exchange_rates.json")
-            if "id" not in item:
-                raise ValidationError(
-                    "Некорректная структура записи history: отсутствует id"
-                )
-        return data
+    # Чтение истории обновлений курсов (JSON Lines или прежний JSON-массив);
+    # fresh=True - в обход кэша чтения
+    def read_exchange_rates_history(self, fresh: bool = False) -> list[dict[str, Any]]:
+        return self._read_json(
+            self.get_exchange_rates_path(),
+            list,
+            _validate_history_structure,
+            loads=_loads_history,
+            fresh=fresh,
+        )
 
-    # Запись истории обновлений курсов
+    # Полная перезапись истории обновлений курсов в формате JSON Lines
     def write_exchange_rates_history(self, history: list[dict[str, Any]]) -> None:
         if not isinstance(history, list):
             raise ValidationError("history должен быть списком")
         for item in history:
             if not isinstance(item, dict):
                 raise ValidationError("Некорректная структура history для записи")
-        self._write_json_atomic(self.get_exchange_rates_path(), history)
+        payload = b"".join(dumps_line(item) for item in history)
+        self._write_bytes_atomic(self.get_exchange_rates_path(), payload, history)
+
+    # Дозапись новых записей в конец истории (JSON Lines) без перезаписи файла.
+    # Файл в прежнем формате JSON-массива один раз переводится в JSON Lines
+    def append_exchange_rates_history(self, items: list[dict[str, Any]]) -> None:
+        if not isinstance(items, list):
+            raise ValidationError("items должен быть списком")
+        for item in items:
+            if not isinstance(item, dict):
+                raise ValidationError("Некорректная структура history для записи")
+
+        path = self.get_exchange_rates_path()
+        # Формат файла проверяется один раз на путь, а не при каждой дозаписи
+        if path not in self._jsonl_paths:
+            if _is_legacy_history(path):
+                self.write_exchange_rates_history(self.read_exchange_rates_history())
+            self._jsonl_paths.add(path)
+
+        # Кэш чтения сбрасывается: копирование всей истории ради его
+        # обновления вернуло бы O(размер истории) на каждую дозапись
+        self._cache.pop(path, None)
+
+        payload = b"".join(dumps_line(item) for item in items)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with path.open("a+b") as f:
+                # Оборванная последняя строка завершается переводом строки,
+                # чтобы новые записи не склеились с ней
+                size = f.seek(0, os.SEEK_END)
+                if size:
+                    f.seek(size - 1)
+                    if f.read(1) != b"\n":
+                        payload = b"\n" + payload
+                f.write(payload)
+        except OSError as exc:
+            raise ValidationError(f"Ошибка записи данных в файл: {path}") from exc
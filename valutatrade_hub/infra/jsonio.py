@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+# orjson - необязательное ускорение (C-реализация); без него используется stdlib json
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None  # type: ignore[assignment]
+
+
+# Сериализация в UTF-8 байты с отступом 2 пробела (формат файлов data/)
+def dumps_bytes(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            data,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+# Сериализация одной записи JSON Lines: компактная строка с завершающим \n
+def dumps_line(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            data,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE,
+        )
+    line = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return (line + "\n").encode("utf-8")
+
+
+# Разбор JSON из байтов без промежуточного декодирования в str.
+# Ошибки формата - подклассы ValueError для обеих реализаций
+def loads_bytes(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
@@ -1,26 +1,36 @@
 from __future__ import annotations
 
+import functools
 import os
 import tomllib
+from collections.abc import Mapping
 from pathlib import Path
+from types import MappingProxyType
 from typing import Any
 
 from valutatrade_hub.core.exceptions import ValidationError
 
+# Настройки, значения которых из переменных окружения приводятся к int / bool
+_NUMERIC_KEYS = frozenset(
+    {
+        "RATES_TTL_SECONDS",
+        "DB_CACHE_TTL_SECONDS",
+        "LOG_MAX_BYTES",
+        "LOG_BACKUP_COUNT",
+    }
+)
+_BOOL_KEYS = frozenset({"CACHE_ENABLED"})
+_TRUE_VALUES = frozenset({"1", "true", "yes", "on"})
+_FALSE_VALUES = frozenset({"0", "false", "no", "off"})
+
 
 # Класс для загрузки и хранения настроек проекта
 class SettingsLoader:
-    _instance: SettingsLoader | None = None
-
-    # Singleton реализован через __new__, так как в приложении 
-    # нужен один источник конфигурации
-    def __new__(cls) -> SettingsLoader:
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._data = {}
-            cls._instance._project_root = cls._instance._detect_project_root()
-            cls._instance.reload()
-        return cls._instance
+    # Единый экземпляр для приложения создается через get_settings()
+    def __init__(self) -> None:
+        self._data: dict[str, Any] = {}
+        self._project_root = self._detect_project_root()
+        self.reload()
 
     # Перезагрузка конфигурации из pyproject.toml с последующим наложением env-overrides
     def reload(self) -> None:
@@ -34,6 +44,11 @@ class SettingsLoader:
             raise ValidationError("Ключ настройки должен быть непустой строкой")
         return self._data.get(key, default)
 
+    # Представление всех настроек только для чтения (без копирования)
+    # для мест, где нужно сразу несколько значений
+    def as_mapping(self) -> Mapping[str, Any]:
+        return MappingProxyType(self._data)
+
     # Получение корневой директории проекта
     def get_project_root(self) -> Path:
         return self._project_root
@@ -48,9 +63,11 @@ class SettingsLoader:
         if not pyproject_path.exists():
             raise ValidationError("Не найден pyproject.toml для загрузки настроек")
 
+        # tomllib разбирает бинарный поток сам, без промежуточной строки
         try:
-            parsed = tomllib.loads(pyproject_path.read_text(encoding="utf-8"))
-        except (OSError, ValueError) as exc:
+            with pyproject_path.open("rb") as fp:
+                parsed = tomllib.load(fp)
+        except (OSError, tomllib.TOMLDecodeError, ValueError) as exc:
             raise ValidationError("Ошибка чтения pyproject.toml") from exc
 
         tool_section = parsed.get("tool")
@@ -67,16 +84,15 @@ class SettingsLoader:
 
         return dict(vt)
 
-    # Применение переменных окружения поверх конфигурации из pyproject
+    # Применение переменных окружения поверх конфигурации из pyproject.
+    # Обрабатываются только ключи, присутствующие и в настройках, и в окружении
+    # (пересечение множеств вместо os.getenv на каждый ключ)
     def _apply_env_overrides(self) -> None:
-        numeric_keys = {"RATES_TTL_SECONDS", "LOG_MAX_BYTES", "LOG_BACKUP_COUNT"}
+        env = os.environ
+        for key in sorted(self._data.keys() & env.keys()):
+            env_val = env[key]
 
-        for key in list(self._data.keys()):
-            env_val = os.getenv(key)
-            if env_val is None:
-                continue
-
-            if key in numeric_keys:
+            if key in _NUMERIC_KEYS:
                 try:
                     self._data[key] = int(env_val)
                 except ValueError as exc:
@@ -85,6 +101,18 @@ class SettingsLoader:
                     ) from exc
                 continue
 
+            if key in _BOOL_KEYS:
+                flag = env_val.strip().lower()
+                if flag in _TRUE_VALUES:
+                    self._data[key] = True
+                elif flag in _FALSE_VALUES:
+                    self._data[key] = False
+                else:
+                    raise ValidationError(
+                        f"Переменная окружения {key} должна быть true или false"
+                    )
+                continue
+
             self._data[key] = env_val
 
     # Функция нормализации путей - относительные значения приводятся 
@@ -100,6 +128,9 @@ class SettingsLoader:
             "LOG_FILE",
         }
 
+        # Корень проекта уже абсолютный (resolve() при определении), поэтому
+        # пути достаточно склеить и нормализовать строково, без обращений к ФС
+        root_str = str(self._project_root)
         for key in path_keys:
             val = self._data.get(key)
             if val is None:
@@ -107,8 +138,14 @@ class SettingsLoader:
             if not isinstance(val, str) or not val.strip():
                 raise ValidationError(f"Настройка {key} должна быть строкой пути")
 
-            raw_path = Path(val)
-            if raw_path.is_absolute():
-                self._data[key] = str(raw_path)
+            if os.path.isabs(val):
+                self._data[key] = os.path.normpath(val)
             else:
-                self._data[key] = str((self._project_root / raw_path).resolve())
+                self._data[key] = os.path.normpath(os.path.join(root_str, val))
+
+
+# Общий для всего процесса экземпляр настроек (в приложении нужен
+# один источник конфигурации); повторные вызовы - обращение к кэшу
+@functools.cache
+def get_settings() -> SettingsLoader:
+    return SettingsLoader()
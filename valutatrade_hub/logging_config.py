@@ -1,26 +1,42 @@
 from __future__ import annotations
 
+import atexit
 import logging
 import logging.handlers
 from pathlib import Path
+from queue import SimpleQueue
 
-from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.infra.settings import get_settings
+
+# Фоновый обработчик очереди логов (один на процесс)
+_listener: logging.handlers.QueueListener | None = None
+
+
+# Остановка фонового обработчика с записью оставшихся в очереди сообщений
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
 
 def setup_logging(level: str | None = None) -> None:
-    settings = SettingsLoader()
+    global _listener
+
+    # все нужные настройки читаются из одного представления
+    cfg = get_settings().as_mapping()
 
     # определение директории и файла логов из настроек
-    log_dir = Path(str(settings.get("LOG_DIR", "logs")))
-    log_file = Path(str(settings.get("LOG_FILE", str(log_dir / "actions.log"))))
+    log_dir = Path(str(cfg.get("LOG_DIR", "logs")))
+    log_file = Path(str(cfg.get("LOG_FILE", str(log_dir / "actions.log"))))
 
     # определение уровня логирования (аргумент функции имеет приоритет)
-    log_level_name = (level or str(settings.get("LOG_LEVEL", "INFO"))).upper()
+    log_level_name = (level or str(cfg.get("LOG_LEVEL", "INFO"))).upper()
     log_level = getattr(logging, log_level_name, logging.INFO)
 
     # Параметры ротации логов
-    max_bytes = int(settings.get("LOG_MAX_BYTES", 1_048_576))
-    backup_count = int(settings.get("LOG_BACKUP_COUNT", 3))
+    max_bytes = int(cfg.get("LOG_MAX_BYTES", 1_048_576))
+    backup_count = int(cfg.get("LOG_BACKUP_COUNT", 3))
 
     # гарантированное создание директории логов
     log_file.parent.mkdir(parents=True, exist_ok=True)
@@ -31,11 +47,18 @@ def setup_logging(level: str | None = None) -> None:
         datefmt="%Y-%m-%dT%H:%M:%S%z",
     )
 
+    # формат не использует сведения о потоках/процессах - logging не собирает
+    # их для каждой записи
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
     # конфигурация корневого логгера
     root_logger = logging.getLogger()
     root_logger.setLevel(log_level)
 
     # очистка ранее зарегистрированных обработчиков
+    _stop_listener()
     for handler in list(root_logger.handlers):
         root_logger.removeHandler(handler)
 
@@ -49,11 +72,24 @@ def setup_logging(level: str | None = None) -> None:
     file_handler.setLevel(log_level)
     file_handler.setFormatter(formatter)
 
-    # консольный обработчик
+    # консольный обработчик работает синхронно, чтобы сообщения в терминале
+    # шли в том же порядке, что и вывод команд CLI
     console_handler = logging.StreamHandler()
     console_handler.setLevel(log_level)
     console_handler.setFormatter(formatter)
+    root_logger.addHandler(console_handler)
+
+    # Файловые записи только ставятся в очередь; запись в файл и ротация
+    # выполняются в фоновом потоке QueueListener
+    queue: SimpleQueue[logging.LogRecord] = SimpleQueue()
+    root_logger.addHandler(logging.handlers.QueueHandler(queue))
+    _listener = logging.handlers.QueueListener(
+        queue,
+        file_handler,
+        respect_handler_level=True,
+    )
+    _listener.start()
+
 
-    # регистрация обработчиков
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
\ No newline at end of file
+# Сообщения, оставшиеся в очереди, записываются при завершении процесса
+atexit.register(_stop_listener)
@@ -1,22 +1,17 @@
 from __future__ import annotations
 
 import time
-from abc import ABC, abstractmethod
-from datetime import UTC, datetime
 from typing import Any
 
 import requests
 from requests import Response
 
 from valutatrade_hub.core.exceptions import ApiRequestError, ValidationError
-from valutatrade_hub.core.utils import make_pair_key, validate_currency_code
+from valutatrade_hub.core.utils import join_pair_key, utc_now_iso
+from valutatrade_hub.infra.jsonio import loads_bytes
 from valutatrade_hub.parser_service.config import ParserConfig
 
 
-def _utc_now_iso() -> str:
-    return datetime.now(UTC).replace(microsecond=0).isoformat()
-
-
 # Жесткая интерпретация HTTP-статусов в прикладные ошибки для CLI/Core
 def _raise_for_status_strict(resp: Response, source: str) -> None:
     status = resp.status_code
@@ -33,24 +28,48 @@ def _raise_for_status_strict(resp: Response, source: str) -> None:
     raise ApiRequestError(f"{source}: ошибка HTTP {status}")
 
 # Функция для безопасного чтения JSON-ответа с проверкой ожидаемого формата
+# (тело разбирается из байтов тем же кодеком, что и файлы данных)
 def _safe_json(resp: Response, source: str) -> dict[str, Any]:
     try:
-        payload = resp.json()
+        payload = loads_bytes(resp.content)
     except ValueError as exc:
         raise ApiRequestError(f"{source}: не удалось разобрать JSON") from exc
     if not isinstance(payload, dict):
         raise ApiRequestError(f"{source}: неожиданный формат JSON (ожидался объект)")
     return payload
 
-# Базовый контракт клиента внешнего API с единым форматом fetch_rates()
-class BaseApiClient(ABC):
+# Базовый контракт клиента внешнего API с единым форматом fetch_rates():
+# ключ - пара FROM_TO, значение - курс и метаданные, в т.ч. коды
+# from_currency/to_currency (чтобы не разбирать ключ пары повторно).
+# Пустой словарь от fetch_rates() означает "данные не изменились"
+# (HTTP 304 на условный запрос по ETag предыдущего ответа).
+# Обычный базовый класс без ABC: RatesUpdater работает с клиентами
+# по контракту (SOURCE + fetch_rates), а не через isinstance
+class BaseApiClient:
 
     SOURCE: str
 
     def __init__(self, config: ParserConfig) -> None:
         self._config = config
-
-    @abstractmethod
+        # Одна HTTP-сессия на клиента: соединение (TCP+TLS) переиспользуется
+        # между обновлениями (keep-alive), общие заголовки задаются один раз
+        self._session = requests.Session()
+        self._session.headers.update({"Accept": "application/json"})
+        # ETag последнего успешно обработанного ответа для условных запросов
+        self._last_etag: str | None = None
+
+    # Заголовки условного запроса (If-None-Match) при известном ETag
+    def _conditional_headers(self) -> dict[str, str] | None:
+        if self._last_etag is None:
+            return None
+        return {"If-None-Match": self._last_etag}
+
+    # Сброс сохраненного ETag: следующий fetch_rates() выполнит полный запрос
+    # (когда курсы источника, о которых ответил 304, уже потеряны)
+    def reset_etag(self) -> None:
+        self._last_etag = None
+
+    # Реализуется в клиентах конкретных API
     def fetch_rates(self) -> dict[str, dict[str, Any]]:
         raise NotImplementedError
 
@@ -61,62 +80,62 @@ class CoinGeckoClient(BaseApiClient):
     SOURCE = "coingecko"
 
     def fetch_rates(self) -> dict[str, dict[str, Any]]:
-        base = validate_currency_code(self._config.BASE_CURRENCY)
+        # Коды валют в ParserConfig уже проверены и нормализованы при загрузке
+        base = self._config.BASE_CURRENCY
         if base != "USD":
             raise ValidationError(
                 "CoinGeckoClient поддерживает только BASE_CURRENCY=USD"
             )
 
-        ids: list[str] = []
-        code_to_id: dict[str, str] = {}
-
-        # Формирование списка идентификаторов CoinGecko по CRYPTO_ID_MAP
-        for code in self._config.CRYPTO_CURRENCIES:
-            c = validate_currency_code(code)
-            raw_id = self._config.CRYPTO_ID_MAP.get(c)
-            if not raw_id:
-                continue
-            ids.append(raw_id)
-            code_to_id[c] = raw_id
-
-        if not ids:
+        # Список идентификаторов CoinGecko подготовлен в ParserConfig.load()
+        code_to_id = self._config.CRYPTO_CODE_TO_ID
+        if not code_to_id:
             raise ValidationError("Не задан список криптовалют для обновления")
 
         url = f"{self._config.COINGECKO_BASE_URL}/simple/price"
-        params = {"ids": ",".join(ids), "vs_currencies": base.lower()}
-        headers: dict[str, str] = {"Accept": "application/json"}
+        params = {"ids": self._config.CRYPTO_IDS_CSV, "vs_currencies": base.lower()}
 
         # Измерение длительности запроса для meta.request_ms
-        start = time.monotonic()
+        start = time.perf_counter_ns()
         try:
-            resp = requests.get(
+            resp = self._session.get(
                 url,
                 params=params,
-                headers=headers,
+                headers=self._conditional_headers(),
                 timeout=self._config.REQUEST_TIMEOUT,
             )
         except requests.RequestException as exc:
             reason = f"{self.SOURCE}: ошибка сети ({exc.__class__.__name__})"
             raise ApiRequestError(reason) from exc
-        request_ms = int((time.monotonic() - start) * 1000)
+        request_ms = (time.perf_counter_ns() - start) // 1_000_000
+
+        # Курсы не изменились с прошлого ответа - разбор не нужен
+        if resp.status_code == 304:
+            return {}
 
         _raise_for_status_strict(resp, self.SOURCE)
         payload = _safe_json(resp, self.SOURCE)
 
         etag = resp.headers.get("ETag")
-        updated_at = _utc_now_iso()
+        updated_at = utc_now_iso()
 
+        # Обход ответа напрямую: id, которых нет в конфигурации, отбрасываются
+        # по обратной таблице id -> код, отсутствующие в ответе не ищутся
+        id_to_code = self._config.CRYPTO_ID_TO_CODE
+        vs_currency = base.lower()
         results: dict[str, dict[str, Any]] = {}
-        for code, raw_id in code_to_id.items():
-            entry = payload.get(raw_id)
-            if not isinstance(entry, dict):
+        for raw_id, entry in payload.items():
+            code = id_to_code.get(raw_id)
+            if code is None or not isinstance(entry, dict):
                 continue
-            rate_val = entry.get(base.lower())
+            rate_val = entry.get(vs_currency)
             if not isinstance(rate_val, int | float):
                 continue
 
-            pair_key = make_pair_key(code, base)
+            pair_key = join_pair_key(code, base)
             results[pair_key] = {
+                "from_currency": code,
+                "to_currency": base,
                 "rate": float(rate_val),
                 "updated_at": updated_at,
                 "source": self.SOURCE,
@@ -133,6 +152,7 @@ class CoinGeckoClient(BaseApiClient):
                 f"{self.SOURCE}: не удалось получить курсы по ответу API"
             )
 
+        self._last_etag = etag
         return results
 
 
@@ -149,22 +169,25 @@ class ExchangeRateApiClient(BaseApiClient):
                 "Установите переменную окружения EXCHANGERATE_API_KEY."
             )
 
-        base = validate_currency_code(self._config.BASE_CURRENCY)
+        base = self._config.BASE_CURRENCY
 
         url = f"{self._config.EXCHANGERATE_BASE_URL}/{api_key}/latest/{base}"
-        headers: dict[str, str] = {"Accept": "application/json"}
 
-        start = time.monotonic()
+        start = time.perf_counter_ns()
         try:
-            resp = requests.get(
-                url, 
-                headers=headers, 
-                timeout=self._config.REQUEST_TIMEOUT
+            resp = self._session.get(
+                url,
+                headers=self._conditional_headers(),
+                timeout=self._config.REQUEST_TIMEOUT,
             )
         except requests.RequestException as exc:
             reason = f"{self.SOURCE}: ошибка сети ({exc.__class__.__name__})"
             raise ApiRequestError(reason) from exc
-        request_ms = int((time.monotonic() - start) * 1000)
+        request_ms = (time.perf_counter_ns() - start) // 1_000_000
+
+        # Курсы не изменились с прошлого ответа - разбор не нужен
+        if resp.status_code == 304:
+            return {}
 
         _raise_for_status_strict(resp, self.SOURCE)
         payload = _safe_json(resp, self.SOURCE)
@@ -180,7 +203,7 @@ class ExchangeRateApiClient(BaseApiClient):
 
         # Фиксация updated_at в ISO; 
         # сохранение оригинальной временной строки в meta при наличии
-        updated_at = _utc_now_iso()
+        updated_at = utc_now_iso()
         time_last_update_utc = payload.get("time_last_update_utc")
         if isinstance(time_last_update_utc, str) and time_last_update_utc.strip():
             pass
@@ -188,8 +211,7 @@ class ExchangeRateApiClient(BaseApiClient):
         etag = resp.headers.get("ETag")
 
         results: dict[str, dict[str, Any]] = {}
-        for code in self._config.FIAT_CURRENCIES:
-            c = validate_currency_code(code)
+        for c in self._config.FIAT_CURRENCIES:
             if c == base:
                 continue
 
@@ -203,8 +225,10 @@ class ExchangeRateApiClient(BaseApiClient):
                 continue
             inverted = 1.0 / direct
 
-            pair_key = make_pair_key(c, base)
+            pair_key = join_pair_key(c, base)
             results[pair_key] = {
+                "from_currency": c,
+                "to_currency": base,
                 "rate": inverted,
                 "updated_at": updated_at,
                 "source": self.SOURCE,
@@ -222,4 +246,5 @@ class ExchangeRateApiClient(BaseApiClient):
                 f"{self.SOURCE}: не удалось получить курсы по ответу API"
             )
 
+        self._last_etag = etag
         return results
@@ -5,7 +5,8 @@ from dataclasses import dataclass
 from pathlib import Path
 
 from valutatrade_hub.core.exceptions import ValidationError
-from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.core.utils import validate_currency_code
+from valutatrade_hub.infra.settings import get_settings
 
 
 @dataclass(slots=True, frozen=True)
@@ -19,6 +20,11 @@ class ParserConfig:
     FIAT_CURRENCIES: tuple[str, ...]
     CRYPTO_CURRENCIES: tuple[str, ...]
     CRYPTO_ID_MAP: dict[str, str]
+    # Производные от CRYPTO_CURRENCIES/CRYPTO_ID_MAP значения для CoinGecko:
+    # пары (код, id), обратная таблица id -> код и готовый параметр ids запроса
+    CRYPTO_CODE_TO_ID: tuple[tuple[str, str], ...]
+    CRYPTO_ID_TO_CODE: dict[str, str]
+    CRYPTO_IDS_CSV: str
 
     RATES_PATH: Path
     EXCHANGE_RATES_PATH: Path
@@ -27,7 +33,7 @@ class ParserConfig:
 
     @staticmethod
     def load() -> ParserConfig:
-        settings = SettingsLoader()
+        settings = get_settings()
 
         # Получение путей из настроек Core/Infra (единая конфигурация для всего проекта)
         rates_path = settings.get("RATES_PATH")
@@ -37,6 +43,29 @@ class ParserConfig:
         if not isinstance(history_path, str) or not history_path.strip():
             raise ValidationError("В настройках не задан EXCHANGE_RATES_PATH")
 
+        # Коды валют проверяются и нормализуются один раз при загрузке,
+        # клиенты API используют их без повторной валидации
+        base_currency = validate_currency_code("USD")
+        fiat_currencies = tuple(
+            validate_currency_code(code) for code in ("EUR", "GBP", "RUB")
+        )
+        crypto_currencies = tuple(
+            validate_currency_code(code) for code in ("BTC", "ETH", "SOL")
+        )
+        # Сопоставление кодов валют внутренним идентификаторам CoinGecko
+        crypto_id_map = {
+            "BTC": "bitcoin",
+            "ETH": "ethereum",
+            "SOL": "solana",
+        }
+
+        # Список идентификаторов CoinGecko формируется один раз при загрузке
+        code_to_id: list[tuple[str, str]] = []
+        for code in crypto_currencies:
+            raw_id = crypto_id_map.get(code)
+            if raw_id:
+                code_to_id.append((code, raw_id))
+
         return ParserConfig(
             # Чтение ключа API только из окружения, 
             # чтобы исключить хранение в репозитории
@@ -45,15 +74,13 @@ class ParserConfig:
             EXCHANGERATE_BASE_URL="https://v6.exchangerate-api.com/v6",
             # Фиксация базовой валюты и поддерживаемых наборов валют 
             # для обновления курсов
-            BASE_CURRENCY="USD",
-            FIAT_CURRENCIES=("EUR", "GBP", "RUB"),
-            CRYPTO_CURRENCIES=("BTC", "ETH", "SOL"),
-            # Сопоставление кодов валют внутренним идентификаторам CoinGecko
-            CRYPTO_ID_MAP={
-                "BTC": "bitcoin",
-                "ETH": "ethereum",
-                "SOL": "solana",
-            },
+            BASE_CURRENCY=base_currency,
+            FIAT_CURRENCIES=fiat_currencies,
+            CRYPTO_CURRENCIES=crypto_currencies,
+            CRYPTO_ID_MAP=crypto_id_map,
+            CRYPTO_CODE_TO_ID=tuple(code_to_id),
+            CRYPTO_ID_TO_CODE={raw_id: code for code, raw_id in code_to_id},
+            CRYPTO_IDS_CSV=",".join(raw_id for _, raw_id in code_to_id),
             # Привязка хранилищ snapshot/history к путям из SettingsLoader
             RATES_PATH=Path(rates_path),
             EXCHANGE_RATES_PATH=Path(history_path),
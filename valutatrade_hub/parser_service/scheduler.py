@@ -14,16 +14,26 @@ def run_periodic_with_updater(updater: RatesUpdater, interval_seconds: int) -> N
     if not isinstance(interval_seconds, int) or interval_seconds <= 0:
         raise ValueError("interval_seconds должен быть положительным целым числом")
 
-    # Запуск цикла периодического обновления с интервалом sleep
+    # Запуск цикла периодического обновления по монотонным "дедлайнам":
+    # длительность run_update не сдвигает расписание следующих запусков
     logger.info("Starting periodic rates update: interval=%s", interval_seconds)
     try:
+        next_deadline = time.monotonic()
         while True:
+            next_deadline += interval_seconds
             try:
                 updater.run_update()
             except ApiRequestError as exc:
                 # Логирование ошибки обновления без остановки цикла
-                logger.error("Periodic update error: %s", str(exc))
-            time.sleep(interval_seconds)
+                logger.error("Periodic update error: %s", exc)
+
+            delay = next_deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Обновление заняло больше интервала - отсчет заново,
+                # без серии запусков "вдогонку"
+                next_deadline = time.monotonic()
     except KeyboardInterrupt:
         # Завершение цикла по прерыванию с понятной записью в лог
         logger.info("Periodic rates update stopped by user")
@@ -1,27 +1,66 @@
 from __future__ import annotations
 
+import re
+from collections.abc import Iterable
 from datetime import UTC, datetime
+from pathlib import Path
 from typing import Any
 
 from valutatrade_hub.core.exceptions import ValidationError
+from valutatrade_hub.core.utils import utc_now_iso
 from valutatrade_hub.infra.database import DatabaseManager
 
-
-def _utc_now_iso() -> str:
-    return datetime.now(UTC).replace(microsecond=0).isoformat()
+# Обязательные поля записи history
+_REQUIRED_RECORD_KEYS = frozenset(
+    {"from_currency", "to_currency", "rate", "timestamp", "source", "meta"}
+)
+
+# Минимально ожидаемый набор полей meta записи history (для проверок/дебага)
+_META_DEFAULTS: dict[str, Any] = {
+    "raw_id": None,
+    "request_ms": None,
+    "status_code": None,
+    "etag": None,
+}
+
+# Каноническая метка UTC вида YYYY-MM-DDTHH:MM:SS+00:00 (как у utc_now_iso())
+# с заведомо допустимыми значениями полей; дни 29-31 (и год с ведущим нулем)
+# не включены - их корректность проверяет fromisoformat
+_CANONICAL_UTC_RE = re.compile(
+    r"[1-9][0-9]{3}-(?:0[1-9]|1[0-2])-(?:0[1-9]|1[0-9]|2[0-8])"
+    r"T(?:[01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]\+00:00"
+)
+
+# Множество id сохраненных записей history: ((путь, mtime_ns, размер), ids).
+# Позволяет дозаписывать историю без повторного чтения всего файла
+_HISTORY_IDS_CACHE: tuple[tuple[str, int, int], set[str]] | None = None
+
+
+# Ключ версии файла для кэша id history (None, если файл недоступен)
+def _file_key(path: Path) -> tuple[str, int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (str(path), st.st_mtime_ns, st.st_size)
 
 
 # Нормализация входной временной метки к ISO 8601 (UTC) с fallback на текущее время
 def _ensure_iso_utc(value: object) -> str:
+    # Быстрый путь: строка уже в каноническом виде (так формирует
+    # utc_now_iso()), повторный разбор не нужен
+    if isinstance(value, str) and _CANONICAL_UTC_RE.fullmatch(value):
+        return value
+
     if isinstance(value, str) and value.strip():
         try:
             dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
             if dt.tzinfo is None:
                 dt = dt.replace(tzinfo=UTC)
-            return dt.astimezone(UTC).replace(microsecond=0).isoformat()
+            return dt.astimezone(UTC).isoformat(timespec="seconds")
         except ValueError:
-            return _utc_now_iso()
-    return _utc_now_iso()
+            return utc_now_iso()
+    return utc_now_iso()
 
 
 class RatesStorage:
@@ -29,7 +68,8 @@ class RatesStorage:
     def __init__(self) -> None:
         self._db = DatabaseManager()
 
-    # Получение актуального snapshot из rates.json (пары + last_refresh)
+    # Получение актуального snapshot из rates.json (пары + last_refresh);
+    # повторные чтения обслуживает кэш DatabaseManager (TTL + mtime)
     def load_snapshot(self) -> dict[str, Any]:
         return self._db.read_rates_snapshot()
 
@@ -41,11 +81,11 @@ class RatesStorage:
 
         snapshot = {
             "pairs": pairs,
-            "last_refresh": _utc_now_iso(),
+            "last_refresh": utc_now_iso(),
         }
         self._db.write_rates_snapshot(snapshot)
 
-    # Получение истории обновлений из exchange_rates.json
+    # Получение истории обновлений из exchange_rates.json (JSON Lines)
     def load_history(self) -> list[dict[str, Any]]:
         return self._db.read_exchange_rates_history()
 
@@ -55,12 +95,10 @@ class RatesStorage:
         if not isinstance(records, list):
             raise ValidationError("records должен быть списком")
 
-        history = self.load_history()
-        existing_ids = {
-            item.get("id")
-            for item in history
-            if isinstance(item, dict) and isinstance(item.get("id"), str)
-        }
+        existing_ids = self._known_history_ids()
+        # Новые записи, индексированные по id (дубликаты внутри records
+        # отбрасываются той же проверкой, что и уже сохраненные)
+        new_records: dict[str, dict[str, Any]] = {}
 
         for record in records:
             if not isinstance(record, dict):
@@ -70,29 +108,58 @@ class RatesStorage:
             if not isinstance(record_id, str) or not record_id.strip():
                 continue
 
-            if record_id in existing_ids:
+            if record_id in existing_ids or record_id in new_records:
                 continue
 
-             # Проверка наличия ключевых полей записи history
-            required = {
-                "from_currency", 
-                "to_currency", 
-                "rate", 
-                "timestamp", 
-                "source", 
-                "meta"
-            }
-            if not required.issubset(record.keys()):
+            # Проверка наличия ключевых полей записи history
+            if not _REQUIRED_RECORD_KEYS <= record.keys():
                 raise ValidationError("Некорректная структура записи history")
 
             meta = record.get("meta")
             if not isinstance(meta, dict):
                 raise ValidationError("meta должен быть словарем")
 
-            history.append(record)
-            existing_ids.add(record_id)
+            new_records[record_id] = record
+
+        # Все записи уже есть в истории - файл не трогается
+        if not new_records:
+            return
+
+        # В файл дописываются только новые записи
+        self._db.append_exchange_rates_history(list(new_records.values()))
+        self._remember_history_ids(existing_ids, new_records.keys())
+
+    # id уже сохраненных записей history; файл читается целиком, только если
+    # он изменился с прошлого обращения (в т.ч. другим процессом). Чтение идет
+    # в обход TTL-кэша DatabaseManager, иначе под новым ключом закрепился бы
+    # прежний список id и записи другого процесса дописывались бы повторно
+    def _known_history_ids(self) -> set[str]:
+        global _HISTORY_IDS_CACHE
+
+        key = _file_key(self._db.get_exchange_rates_path())
+        if (
+            key is not None
+            and _HISTORY_IDS_CACHE is not None
+            and _HISTORY_IDS_CACHE[0] == key
+        ):
+            return _HISTORY_IDS_CACHE[1]
+
+        ids = {
+            item["id"]
+            for item in self._db.read_exchange_rates_history(fresh=True)
+            if isinstance(item, dict) and isinstance(item.get("id"), str)
+        }
+        if key is not None:
+            _HISTORY_IDS_CACHE = (key, ids)
+        return ids
 
-        self._db.write_exchange_rates_history(history)
+    # Обновление кэша id после дозаписи новых записей в history
+    def _remember_history_ids(self, ids: set[str], added: Iterable[str]) -> None:
+        global _HISTORY_IDS_CACHE
+
+        ids.update(added)
+        key = _file_key(self._db.get_exchange_rates_path())
+        _HISTORY_IDS_CACHE = (key, ids) if key is not None else None
 
     @staticmethod
     def build_history_record(
@@ -106,17 +173,13 @@ class RatesStorage:
     ) -> dict[str, Any]:
         ts = _ensure_iso_utc(timestamp)
         # Формирование id как ключа дедупликации по паре и моменту фиксации курса
-        record_id = f"{from_currency}_{to_currency}_{ts}"
+        record_id = "_".join((from_currency, to_currency, ts))
 
-        safe_meta: dict[str, Any] = {}
+        # Нормализация meta: значения по умолчанию дополняются полями клиента
         if isinstance(meta, dict):
-            safe_meta = dict(meta)
-
-        # Нормализация meta до минимально ожидаемого набора полей для проверок/дебага
-        safe_meta.setdefault("raw_id", None)
-        safe_meta.setdefault("request_ms", None)
-        safe_meta.setdefault("status_code", None)
-        safe_meta.setdefault("etag", None)
+            safe_meta = {**_META_DEFAULTS, **meta}
+        else:
+            safe_meta = dict(_META_DEFAULTS)
 
         return {
             "id": record_id,
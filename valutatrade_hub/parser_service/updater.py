@@ -2,19 +2,16 @@ from __future__ import annotations
 
 import logging
 from collections.abc import Iterable
-from datetime import UTC, datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 from valutatrade_hub.core.exceptions import ApiRequestError, ValidationError
+from valutatrade_hub.core.utils import utc_now_iso
 from valutatrade_hub.parser_service.storage import RatesStorage
 
 logger = logging.getLogger("valutatrade_hub.parser.updater")
 
 
-def _utc_now_iso() -> str:
-    return datetime.now(UTC).replace(microsecond=0).isoformat()
-
-
 # Нормализация фильтра источника для единообразного выбора клиента
 def _normalize_source_filter(value: str | None) -> str | None:
     if value is None:
@@ -27,6 +24,15 @@ def _normalize_source_filter(value: str | None) -> str | None:
     return v
 
 
+# Запрос курсов у одного клиента; ApiRequestError возвращается вместе
+# с результатом, остальные исключения пробрасываются вызывающему коду
+def _fetch_client(client: Any) -> tuple[Any, ApiRequestError | None]:
+    try:
+        return client.fetch_rates(), None
+    except ApiRequestError as exc:
+        return None, exc
+
+
 class RatesUpdater:
 
     def __init__(self, clients: Iterable[Any], storage: RatesStorage) -> None:
@@ -40,23 +46,38 @@ class RatesUpdater:
         pairs: dict[str, dict[str, Any]] = {}
         history_records: list[dict[str, Any]] = []
 
+        # Применение фильтра источника при точечном обновлении
+        selected: list[tuple[Any, str]] = []
         for client in self._clients:
             client_source = getattr(client, "SOURCE", client.__class__.__name__)
             client_source_norm = str(client_source).strip().lower()
-
-            # Применение фильтра источника при точечном обновлении
             if src_filter is not None and client_source_norm != src_filter:
                 continue
+            selected.append((client, client_source_norm))
+
+        # Источники независимы, поэтому запросы к ним выполняются параллельно:
+        # общее время равно самому долгому запросу, а не их сумме
+        if len(selected) > 1:
+            with ThreadPoolExecutor(max_workers=len(selected)) as executor:
+                outcomes = list(
+                    executor.map(_fetch_client, (c for c, _ in selected))
+                )
+        else:
+            outcomes = [_fetch_client(c) for c, _ in selected]
+
+        # Предыдущий snapshot нужен только источникам, ответившим "не изменилось"
+        previous_pairs: dict[str, Any] | None = None
 
-            try:
-                results = client.fetch_rates()
-            except ApiRequestError as exc:
-                # Локализация ошибки на уровне конкретного клиента 
+        for (client, client_source_norm), (results, error) in zip(
+            selected, outcomes, strict=True
+        ):
+            if error is not None:
+                # Локализация ошибки на уровне конкретного клиента
                 # без остановки общего обновления
                 logger.error(
                     "Rates update failed for source=%s: %s",
                     client_source_norm,
-                    str(exc),
+                    error,
                 )
                 continue
 
@@ -64,6 +85,47 @@ class RatesUpdater:
                 logger.error("Client %s returned invalid format", client_source_norm)
                 continue
 
+            # Пустой результат - данные источника не изменились (HTTP 304):
+            # его курсы переносятся из текущего snapshot без записи в историю
+            if not results:
+                if previous_pairs is None:
+                    previous_pairs = self._load_previous_pairs()
+                kept = {
+                    pair_key: entry
+                    for pair_key, entry in previous_pairs.items()
+                    if isinstance(entry, dict)
+                    and entry.get("source") == client_source_norm
+                }
+                if kept:
+                    pairs.update(kept)
+                    continue
+
+                # Переносить нечего (snapshot перезаписан или не был сохранен):
+                # ETag сбрасывается и курсы запрашиваются заново целиком,
+                # иначе источник отвечал бы 304 до изменения данных
+                logger.warning(
+                    "Source %s reported no changes, but the snapshot "
+                    "has no rates from it; refetching",
+                    client_source_norm,
+                )
+                reset_etag = getattr(client, "reset_etag", None)
+                if reset_etag is None:
+                    continue
+                reset_etag()
+                results, error = _fetch_client(client)
+                if error is not None:
+                    logger.error(
+                        "Rates update failed for source=%s: %s",
+                        client_source_norm,
+                        error,
+                    )
+                    continue
+                if not isinstance(results, dict) or not results:
+                    logger.error(
+                        "Client %s returned invalid format", client_source_norm
+                    )
+                    continue
+
             for pair_key, payload in results.items():
                 # Отсечение некорректных ключей и payload 
                 # до формирования snapshot/history
@@ -72,17 +134,22 @@ class RatesUpdater:
                 if not isinstance(payload, dict) or "rate" not in payload:
                     continue
 
-                parts = pair_key.split("_")
-                if len(parts) != 2:
-                    continue
-                from_cur, to_cur = parts[0], parts[1]
+                # Коды валют берутся из payload клиента; ключ пары разбирается,
+                # только если клиент их не передал
+                from_cur = payload.get("from_currency")
+                to_cur = payload.get("to_currency")
+                if not isinstance(from_cur, str) or not isinstance(to_cur, str):
+                    parts = pair_key.split("_")
+                    if len(parts) != 2:
+                        continue
+                    from_cur, to_cur = parts[0], parts[1]
 
                 try:
                     rate = float(payload["rate"])
                 except (TypeError, ValueError):
                     continue
 
-                updated_at = payload.get("updated_at") or _utc_now_iso()
+                updated_at = payload.get("updated_at") or utc_now_iso()
                 source_name = payload.get("source") or client_source_norm
 
                 # Формирование записи snapshot в формате, 
@@ -116,3 +183,12 @@ class RatesUpdater:
         self._storage.append_history(history_records)
 
         logger.info("Rates update completed successfully: %d pairs", len(pairs))
+
+    # Пары текущего snapshot (пустой словарь, если snapshot недоступен)
+    def _load_previous_pairs(self) -> dict[str, Any]:
+        try:
+            snapshot = self._storage.load_snapshot()
+        except ValidationError:
+            return {}
+        pairs = snapshot.get("pairs")
+        return pairs if isinstance(pairs, dict) else {}